@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""Benchmark of the streaming export (write_json / write_csv) against converting back first.
+
+Each mode runs in its own process, reporting the time of the export and the growth of the peak
+memory (max RSS) over the memory used by the model tree itself.
+
+usage: ETS_TOOLKIT=null python benchmarks/bench_export.py [--records 50000]
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+sys.path.insert( 0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir) )
+import gforms
+
+MODES = [ 'get_object + json.dump', 'write_json', 'write_csv' ]
+
+
+class Record(object):
+    def __init__( self, **kw ):
+        self.__dict__.update( kw )
+
+class Address(object):
+    def __init__( self, **kw ):
+        self.__dict__.update( kw )
+
+class Dataset(object):
+    def __init__( self, **kw ):
+        self.__dict__.update( kw )
+
+
+def build( n ):
+    records = [ Record( id=i, name="record %d" % i, score=i * 0.5, active=bool(i % 2),
+                        address=Address( street="Bytes Av", number=i % 100 ),
+                        tags=[ "t%d" % (i % 7), "x" ] ) for i in range(n) ]
+    return gforms.get_or_create_editor_for_obj( Dataset( name="dataset", records=records ) )
+
+
+def to_json( obj ):
+    return dict( (k, v) for k, v in vars(obj).items() if not k.startswith('_') )
+
+
+def max_rss_mb():
+    return resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss / 1024.0
+
+
+def run_mode( mode, n ):
+    gforms._logging.loglevel = -1
+    model = build( n )
+    base = max_rss_mb()
+    with open( os.devnull, 'w' ) as out:
+        t = time.time()
+        if mode == 'write_json':
+            gforms.write_json( model, out )
+        elif mode == 'write_csv':
+            gforms.write_csv( model.records, out )
+        else:
+            json.dump( model.get_object(), out, default=to_json )
+        elapsed = time.time() - t
+    print( "%-26s %8.2f s %10.1f MB" % (mode, elapsed, max_rss_mb() - base) )
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__.split("\n")[0] )
+    parser.add_argument( '--records', type=int, default=50000 )
+    parser.add_argument( '--mode', choices=MODES, help=argparse.SUPPRESS )
+    args = parser.parse_args()
+
+    if args.mode:
+        return run_mode( args.mode, args.records )
+    print( "%d records. %-15s %8s %13s" % (args.records, "", "time", "peak growth") )
+    for mode in MODES:
+        subprocess.check_call( [sys.executable, __file__, '--records', str(args.records), '--mode', mode] )
+
+
+if __name__ == '__main__':
+    main()
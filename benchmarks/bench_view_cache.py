@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""Benchmark of repeated sub-form opens: getting the default View of each element of a list.
+
+Compares the View built for every open, as traits does by default, with the Views cached per
+signature of the fields and shared by all the elements.
+
+usage: ETS_TOOLKIT=null python benchmarks/bench_view_cache.py [--elements 500] [--fields 10]
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert( 0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir) )
+import gforms
+from traits.api import HasTraits
+
+
+class Record(object):
+    def __init__( self, **kw ):
+        self.__dict__.update( kw )
+
+
+def uncached_view( model ):
+    "The default View as traits builds it, without the gforms cache"
+    return model.__class__._trait_view( None, None, lambda: HasTraits.default_traits_view(model),
+                                        model.trait_view_elements, model.visible_traits, model )
+
+
+def measure( name, models, get_view ):
+    t = time.time()
+    for model in models:
+        get_view( model )
+    elapsed = time.time() - t
+    print( "%-34s %8.1f ms %8.1f us/open" % (name, elapsed * 1000, elapsed * 1e6 / len(models)) )
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__.split("\n")[0] )
+    parser.add_argument( '--elements', type=int, default=500 )
+    parser.add_argument( '--fields', type=int, default=10 )
+    args = parser.parse_args()
+
+    gforms._logging.loglevel = -1
+    fields = lambda i: dict( ('field%d' % k, [i, "text", 0.5, True][k % 4]) for k in range(args.fields) )
+    records = gforms.get_or_create_editor_for_obj( [ Record(**fields(i)) for i in range(args.elements) ] )
+    generics = [ gforms.GenericTrait( fields(i) ) for i in range(args.elements) ]
+
+    print( "%d elements of %d fields" % (args.elements, args.fields) )
+    for kind, models in ( ("dynamic models", list(records)), ("generic traits", generics) ):
+        measure( "%s, built per open" % kind, models, uncached_view )
+        measure( "%s, cached" % kind, models, lambda model: model.trait_view() )
+
+
+if __name__ == '__main__':
+    main()
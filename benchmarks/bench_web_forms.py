@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""Load benchmark of the headless forms backend (gforms_web).
+
+Measures forms rendered and submissions parsed per second, directly and through
+the WSGI application, from a number of threads simulating concurrent users.
+
+usage: ETS_TOOLKIT=null python benchmarks/bench_web_forms.py [--users 20] [--threads 4] [--seconds 2]
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import argparse
+import threading
+import urllib
+from StringIO import StringIO
+from wsgiref.util import setup_testing_defaults
+
+sys.path.insert( 0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir) )
+import gforms
+import gforms_web
+
+SCHEMA = {
+    'User':     { 'properties': { 'name': 'string', 'number': 'integer', 'email': 'string',
+                                  'active': 'boolean', 'role': {'enum': ['user', 'admin']} },
+                  'templates':  { 'user1': {'name': "F1", 'number': 1} } },
+    'UserList': { 'type': 'array', 'items': {'$ref': 'User'} },
+    'System':   { 'properties': { 'users': {'$ref': 'UserList'}, 'location': 'string',
+                                  'admin': 'User', 'tags': ['string'] } }
+}
+
+
+def build_system( models, n_users ):
+    system = models['System']()
+    system.location = "Bytes Av, 16"
+    system.tags = ['a', 'b', 'c']
+    for i in range( n_users ):
+        user = models['User']()
+        user.name, user.number, user.email = "User %d" % i, i, "user%d@example.com" % i
+        system.users.append( user )
+    return system
+
+
+def run( name, func, threads, seconds ):
+    counts = [0] * threads
+    deadline = time.time() + seconds
+
+    def worker( i ):
+        while time.time() < deadline:
+            func()
+            counts[i] += 1
+
+    workers = [ threading.Thread(target=worker, args=(i,)) for i in range(threads) ]
+    for w in workers: w.start()
+    for w in workers: w.join()
+    print( "%-28s %10.1f /s" % (name, sum(counts) / float(seconds)) )
+
+
+def wsgi_call( app, method, path, body="" ):
+    environ = {}
+    setup_testing_defaults( environ )
+    environ.update( REQUEST_METHOD=method, PATH_INFO=path, CONTENT_LENGTH=str(len(body)) )
+    environ['wsgi.input'] = StringIO( body )
+    return app( environ, lambda status, headers: None )
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__.split("\n")[0] )
+    parser.add_argument( '--users', type=int, default=20, help="list elements in the form" )
+    parser.add_argument( '--threads', type=int, default=4, help="concurrent clients" )
+    parser.add_argument( '--seconds', type=float, default=2.0, help="duration of each measure" )
+    args = parser.parse_args()
+
+    gforms._logging.loglevel = 0
+    models = gforms.load_schema( SCHEMA, cache_dir=False )
+    System = models['System']
+    system = build_system( models, args.users )
+    values = gforms_web.form_values( system )
+    body = urllib.urlencode( dict(((k, v.encode('utf-8')) for k, v in values.items()), __submit__='1') )
+    app = gforms_web.FormsApp( models )
+
+    t = time.time()
+    gforms_web.render_form( system )
+    print( "%-28s %10.2f ms" % ("first render (compiles)", (time.time() - t) * 1000) )
+    t = time.time()
+    gforms_web.render_form( system )
+    print( "%-28s %10.2f ms" % ("second render", (time.time() - t) * 1000) )
+    print( "%d users in the form, %d fields, %d threads" % (args.users, len(values), args.threads) )
+
+    run( "schema", lambda: gforms_web.form_schema_json(System), args.threads, args.seconds )
+    run( "render_form", lambda: gforms_web.render_form(system), args.threads, args.seconds )
+    run( "parse_form", lambda: gforms_web.parse_form(System, values), args.threads, args.seconds )
+    run( "wsgi GET form", lambda: wsgi_call(app, 'GET', '/System'), args.threads, args.seconds )
+    run( "wsgi POST submit", lambda: wsgi_call(app, 'POST', '/System', body), args.threads, args.seconds )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""Stress test of concurrent conversions of shared types.
+
+Worker threads convert payloads of the same classes at the same time: dynamic models being
+created and extended (new fields in later payloads), fields of conflicting types (specialized per
+instance), schema models loaded concurrently and api type handlers registered meanwhile.
+Every conversion is converted back and compared to its payload. Exits with 1 on any failure.
+
+usage: ETS_TOOLKIT=null python benchmarks/stress_concurrent_conversion.py [--threads 8] [--iterations 200]
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+import traceback
+
+sys.path.insert( 0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir) )
+import gforms
+
+SCHEMA = {
+    'Device':     { 'properties': { 'name': 'string', 'port': 'integer', 'tags': ['string'] } },
+    'DeviceList': { 'type': 'array', 'items': {'$ref': 'Device'} },
+}
+
+
+class Record(object):
+    def __init__( self, **kw ):
+        self.__dict__.update( kw )
+
+class Address(object):
+    def __init__( self, **kw ):
+        self.__dict__.update( kw )
+
+class Tag(object):
+    def __init__( self, **kw ):
+        self.__dict__.update( kw )
+
+class Device(object):
+    def __init__( self, **kw ):
+        self.__dict__.update( kw )
+
+
+def make_payload( rnd, i ):
+    records = []
+    for j in range( rnd.randint(2, 8) ):
+        record = Record( id=j, name="record %d.%d" % (i, j), score=rnd.random(),
+                         address=Address( street="Bytes Av", number=rnd.randint(1, 99) ),
+                         tags=[ Tag(label="t%d" % k) for k in range(rnd.randint(1, 3)) ],
+                         #Conflicting types among records -> Generic, specialized per instance
+                         extra=Address(street="x", number=j) if j % 2 else j )
+        if rnd.random() < 0.3:
+            record.comment = "seen later"  #Extends the dynamic model
+        records.append( record )
+    devices = [ Device( name="dev%d" % k, port=k, tags=["a", "b"] ) for k in range(rnd.randint(1, 4)) ]
+    return { 'records': records, 'devices': devices, 'owner': "user %d" % i }
+
+
+def plain( obj ):
+    """Structure with plain values, for comparing"""
+    if isinstance( obj, dict ):
+        return dict( (k, plain(v)) for k, v in obj.items() if not k.startswith('_') )
+    if isinstance( obj, (list, tuple) ):
+        return [ plain(v) for v in obj ]
+    if hasattr( obj, '__dict__' ):
+        return plain( vars(obj) )
+    return obj
+
+
+def matches( expected, result ):
+    """Whether the result holds the expected data. Models add fields of their class which the
+    payload didnt have, with default (empty) values"""
+    if isinstance( expected, dict ) and isinstance( result, dict ):
+        return all( k in result and matches(v, result[k]) for k, v in expected.items() ) and \
+               all( not v for k, v in result.items() if k not in expected )
+    if isinstance( expected, list ) and isinstance( result, list ):
+        return len(expected) == len(result) and all( matches(a, b) for a, b in zip(expected, result) )
+    return expected == result
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__.split("\n")[0] )
+    parser.add_argument( '--threads', type=int, default=8 )
+    parser.add_argument( '--iterations', type=int, default=200, help="conversions per thread" )
+    args = parser.parse_args()
+
+    gforms._logging.loglevel = -1
+    failures = []
+    schema_classes = []
+    counts = [0] * args.threads
+    start = threading.Event()
+
+    def worker( n ):
+        rnd = random.Random( n )
+        start.wait()
+        try:
+            schema_classes.append( gforms.load_schema(SCHEMA, cache_dir=False) )
+            for i in range( args.iterations ):
+                if i == args.iterations // 2:
+                    gforms.register_api_type_handler( **{'Unused%d' % n: gforms.ClassModel} )
+                payload = make_payload( rnd, i )
+                expected = plain( payload )
+                model = gforms.get_or_create_editor_for_obj( payload )
+                result = plain( model.get_object() )
+                if not matches( expected, result ):
+                    failures.append( "thread %d, payload %d:\n  %r\n  %r" % (n, i, expected, result) )
+                counts[n] += 1
+        except Exception:
+            failures.append( "thread %d:\n%s" % (n, traceback.format_exc()) )
+
+    threads = [ threading.Thread(target=worker, args=(n,)) for n in range(args.threads) ]
+    for t in threads: t.start()
+    t0 = time.time()
+    start.set()
+    for t in threads: t.join()
+    elapsed = time.time() - t0
+
+    if any( classes is not schema_classes[0] for classes in schema_classes ):
+        failures.append( "load_schema built different classes for the same schema" )
+    if gforms._logging.depth != 0:
+        failures.append( "logging depth not restored" )
+
+    print( "%d conversions in %d threads, %.2f s (%.1f /s)" % (sum(counts), args.threads, elapsed, sum(counts) / elapsed) )
+    for failure in failures[:10]:
+        print( "FAILED", failure )
+    print( "%d failures" % len(failures) )
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -68,6 +68,28 @@ For bug and other reports please contact fernando.pereira@cern.ch"
 ----------------------------------------------------------------------------  
 """
 from __future__ import print_function
+import os
+import sys
+import csv
+import json
+import hashlib
+import tempfile
+import random
+import re
+import itertools
+import bisect
+import difflib
+import weakref
+import threading
+import time
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 __author__ = "Fernando Pereira"
 __email__ = "fernando.pereira@cern.ch"
@@ -76,13 +98,16 @@ __status__ = "Development"   #"Prototype", "Development", or "Production".
 __copyright__ = "Copyright (C) 2015 CERN"
 
 from traits.trait_types import *
-from traits.has_traits import HasTraits, HasPrivateTraits
+from traits.has_traits import HasTraits, HasPrivateTraits, not_event
 from traits.trait_base import is_none
 from traits.trait_errors import TraitError
+from traits.trait_handlers import TraitCoerceType
+from traits.traits import Trait
 
 from traitsui.editors import  *
 from traitsui.view import View
 from traitsui.item import Item
+from traitsui.group import HGroup
 
 #Patch traits with a version GUI optimized, pull request #234
 #--------------
@@ -96,9 +121,11 @@ trait_handlers.TraitType.__init__ = trait_handlers_patch.__init__
 #-------------------------------------------------------------------------------------------------
 # gForms "public" API
 #-------------------------------------------------------------------------------------------------
-__all__ = [ 'Object', 'edit', 'get_or_create_editor_for_obj', 'register_api_type_handler',
-            'ClassModel', 'ListClassModel', 
-            'Str', 'Int', 'List', 'Dict', 'Bool', 'Enum', 'Password', 'ListOf', 'ListOfStr', 'ModelInstance','Instance','GenericTrait','Any'] #Exported Types
+__all__ = [ 'Object', 'CompactObject', 'edit', 'get_or_create_editor_for_obj', 'register_api_type_handler',
+            'load_schema', 'set_inference', 'warm_up', 'WarmUp', 'iter_events', 'write_json', 'write_csv',
+            'ClassModel', 'ListClassModel', 'UnionListClassModel', 'BulkUpdate',
+            'Str', 'Int', 'List', 'Dict', 'Bool', 'Enum', 'Password', 'ListOf', 'ListOfStr', 'ModelInstance','Instance',
+            'GenericTrait','WideGenericTrait','Any'] #Exported Types
 
 #-------------------------------------------------------------------------------------------------
 # globals
@@ -108,11 +135,31 @@ class _O(object):pass
 #Base flow Exception
 class FormsException(Exception):pass
 
-_logging = _O()
+class _LoggingState(_O):
+    """Logging settings are global, the nesting depth of the conversion is per thread"""
+    _local = threading.local()
+    depth = property( lambda self: getattr(self._local, 'depth', 0),
+                      lambda self, value: setattr(self._local, 'depth', value) )
+
+_logging = _LoggingState()
 _logging.loglevel = 1 #logLevels not known yet
-_logging.depth = 0
 _logging.stream = sys.stdout
 
+# Guards the creation of dynamic classes and the registries of types. Lookups dont lock:
+# registered classes are never modified afterwards, they are replaced (copy on write)
+_classes_lock = threading.RLock()
+
+# Schema inference of dynamic models and lists. See set_inference()
+_inference = _O()
+_inference.strategy = 'first_k'  #'first', 'first_k', 'reservoir' or 'full'
+_inference.sample_size = 50       #Lists up to this size are always fully scanned
+_inference.budget = 5000          #Max number of fields merged per inference
+
+# Objects/dicts with more fields than threshold are shown paged (see WideGenericTrait)
+_wide = _O()
+_wide.threshold = 500
+_wide.page_size = 50
+
 # ------- other existing globals, but initialized during program flow ------------
 # _base_types_to_trait   #(dict) ->  base python types to trait types
 # _registered_base_types #(list) ->  python types supported as base types
@@ -149,6 +196,50 @@ class Object(object):
 
 
 
+#==================================================================================================
+#--------------------------------------------------------------------------------------------------
+class CompactObject(object):
+    """Base of the record types produced by get_object(compact=True), one per model and set of
+    fields. Attribute compatible with Object, but fields are kept in __slots__ instead of a dict
+    per record. vars() / __dict__ return a copy of the fields
+    """
+#--------------------------------------------------------------------------------------------------
+    __slots__ = ()
+    
+    def __init__(self, init_dict = {}):
+        for name, value in init_dict.iteritems():
+            setattr( self, name, value )
+    
+    @property
+    def __dict__(self):
+        return dict( (name, getattr(self, name)) for name in self.__slots__ if hasattr(self, name) )
+    
+    def __repr__(self):
+        import pprint
+        return "<%s%s>" % (self.__class__.__name__, pprint.pformat(self.__dict__) )
+
+
+#Record types, by (name, field names)
+_record_classes = {}
+_identifier = re.compile( r"[A-Za-z_]\w*$" )
+
+def _compact_record( name, fields ):
+    """Returns a record (CompactObject) of the type for this name and field names, holding the fields.
+    Fields which cant be slots (not identifiers) are kept in an Object instead"""
+    key = ( name, tuple(sorted(fields)) )
+    record_class = _record_classes.get( key )
+    if record_class is None:
+        if not all( isinstance(field, str) and _identifier.match(field) for field in key[1] ):
+            return Object( fields )
+        with _classes_lock:
+            record_class = _record_classes.get( key )
+            if record_class is None:
+                log( LOG_LEVEL.DEBUG, "   > Creating record type", name, "with", len(key[1]), "fields" )
+                record_class = _record_classes[key] = type( name, (CompactObject,), dict(__slots__=key[1]) )
+    return record_class( fields )
+
+
+
 #-------------------------------------------------------------------------------------------------
 #A new ListStr type, having the default editor set to ListStrEditor
 #-------------------------------------------------------------------------------------------------
@@ -166,6 +257,10 @@ class ClassModel(HasTraits):
     __orig_obj = Any(None, private=True)
     _templates = Dict( Str, Dict, private = True )
     Templates  = Any( private=True )
+    bulk_updated = Event( private=True )  #Fired once per committed bulk_update(), with the changes
+    _path_index  = Any( None, private=True )
+    _fingerprint_cache   = Any( None, private=True, transient=True )  #See _model_fingerprint()
+    _fingerprint_holders = Any( None, private=True, transient=True )
 
     #--------------------------------------------------------------------------------------------------
     def __init__(self, obj=None, **kw ):
@@ -191,9 +286,41 @@ class ClassModel(HasTraits):
     def _Templates_changed(self, old, new):
         """Handler for updating the properties when the template dropdown is changed"""
     #--------------------------------------------------------------------------------------------------
-        try: self.set( **self._templates[new] )
+        try: template = self._templates[new]
         except KeyError:
             self.reset_traits()
+        else:
+            self.bulk_update( **template ).apply()
+    
+    
+    #--------------------------------------------------------------------------------------------------
+    def bulk_update( self, **traits ):
+        """Transaction over the model and all its sub models, to be used as a context manager.
+        Notifications are held until the end and traits, if given, are validated before any change.
+        See BulkUpdate"""
+    #--------------------------------------------------------------------------------------------------
+        return BulkUpdate( self, traits )
+    
+    
+    #--------------------------------------------------------------------------------------------------
+    def get_path( self, path ):
+        """Gets the value at a path relative to this model, e.g. "users[3].number". See select()"""
+    #--------------------------------------------------------------------------------------------------
+        return _path_index_of( self ).get( path )
+    
+    #--------------------------------------------------------------------------------------------------
+    def set_path( self, path, value ):
+        """Sets the value of the fields matching the path, e.g. "users[*].number". All values are
+        validated first, then set in a single bulk_update(). Returns the number of fields set"""
+    #--------------------------------------------------------------------------------------------------
+        return _path_index_of( self ).set( path, value )
+    
+    #--------------------------------------------------------------------------------------------------
+    def select( self, pattern ):
+        """Returns [(path, value)] of the fields matching the pattern. Fields are separated by '.'
+        and list elements are given as [index]. '*' matches any field and '[*]' any element"""
+    #--------------------------------------------------------------------------------------------------
+        return _path_index_of( self ).select( pattern )
     
     
     #Cant be done directly, since Arrays have to be converted to instances of ListClass Model
@@ -202,20 +329,25 @@ class ClassModel(HasTraits):
         """Initializes the trait structure, converting and assingning values"""
     #--------------------------------------------------------------------------------------------------
         invalid_keys = ["Templates"]
-        mod_traits = {}
+        #Base type values and lists are validated at once. Only the others go one by one
+        mod_traits, mod_lists = _batch_validate_traits( self, traits, invalid_keys )
 
         for key,val in traits.iteritems():
             if key.startswith('_') or key in invalid_keys or val is None: continue   #Dont edit private fields
+            if key in mod_traits or key in mod_lists: continue
             
             if type(val) not in _registered_base_types and not _is_list(val):
                 t = get_obj_t( _type_func(val) )
                 if isinstance( t, List ): continue  # type and value dont match (this should be an exception, but in SUDS arrays are normal objects, expected to be replaced
                 try:
                     iface, val = get_or_create_trait_for( val )
-                    if self.__class_traits__[key].trait_type.__class__ == Generic:
+                    ctrait = self.trait( key )
+                    if ctrait is None:
+                        raise KeyError( key )
+                    if ctrait.trait_type.__class__ == Generic:
+                        #Only for this instance, the class is shared (possibly with other threads)
                         log( LOG_LEVEL.DEBUG, "Changing trait type" )
-                        del self.__class_traits__[key]
-                        self.add_class_trait( key, iface )
+                        self.add_trait( key, iface )
                 except Exception as e:
                     log( LOG_LEVEL.ERROR, "Could not create a trait from %s to assign to %s" %( str(val), key), "Error:", str(e) )
                     continue 
@@ -229,10 +361,18 @@ class ClassModel(HasTraits):
                 if _is_list(val):
                     if len(val):
                         # Not generic incurs all elements being of same type
-                        subt = _type_func(val[0]) 
-                        tlistc = _getClassListOf(subt)
-                        #Convert to the corresponding ClassList type
-                        obj = tlistc(val)
+                        subt = _type_func(val[0])
+                        #Declared list model, otherwise the dynamically created for the inner type
+                        tlistc = getattr( self.trait(key).handler, 'klass', None )
+                        if not (isinstance(tlistc, type) and issubclass(tlistc, ListClassModel)) \
+                           or tlistc is ListClassModel:
+                            tlistc = _getClassListOf(subt)
+                        if tlistc is None or any( _type_func(elem) is not subt for elem in val ):
+                            #Mixed list, or a type seen for the first time
+                            obj = create_list_trait( val )[1]
+                        else:
+                            #Convert to the corresponding ClassList type
+                            obj = tlistc(val)
                         mod_traits[key] = obj
                     else:
                         #Empty list -> no need for initializing
@@ -241,25 +381,41 @@ class ClassModel(HasTraits):
                     # Looks like a base type it cant handle
                     log( LOG_LEVEL.ERROR, str(e) )
         
-        return self.set(False, **mod_traits)
+        self.set(False, **mod_traits)
+        #Validated lists are stored as they are, also without notifying
+        self.__dict__.update( mod_lists )
+        mod_traits.update( mod_lists )
+        if mod_traits:
+            _PathIndex.invalidate( self, mod_traits )
+            _fingerprint_changed( self )
+        return self
     
     
     #--------------------------------------------------------------------------------------------------
-    def get_conv( self ):
+    def get_conv( self, compact=False ):
         "Get the current object properties properly converted back"
     #--------------------------------------------------------------------------------------------------
+        if compact:
+            #All the way to plain values and records, nothing is left holding models
+            elems = dict( (name, getattr(self, name)) for name in _field_names(self) )
+            _map_dic_values( lambda x: GenericTrait.cast_back(x, compact=True)
+                                       if isinstance(x, (HasTraits, TraitListObject)) else x, elems )
+            return elems
         elems = self.get(private=is_none)
         _map_dic_values( lambda x: x.get_object() if isinstance(x, ClassModel) else x, elems) 
         return elems
     
     
     #--------------------------------------------------------------------------------------------------        
-    def get_object( self, as_dict=False ):
-        "Returns orig_object modified, or the fields as a dictionary"
+    def get_object( self, as_dict=False, compact=False ):
+        """Returns orig_object modified, or the fields as a dictionary.
+        With compact=True new records (see CompactObject) are returned instead of the objects"""
     #--------------------------------------------------------------------------------------------------
-        elems = self.get_conv()
+        elems = self.get_conv( compact )
         if as_dict:
             return elems 
+        elif compact:
+            return _compact_record( self.__class__.__name__, elems )
         else:
             try:
                 self.__orig_obj.__dict__.update(elems)  #--> need to convert back
@@ -268,6 +424,71 @@ class ClassModel(HasTraits):
                 return self #Again should not happen. This means we're abusing the api and creating directly a ClassModel subclass. That's why __repr__ was implemented
     
 
+    #--------------------------------------------------------------------------------------------------
+    def refresh_from( self, obj ):
+        """Updates the model to a changed version of the source object (or dictionary).
+        Only changed fields are set, fields missing from the source (or None) are reset to their
+        default. Sub models and lists are refreshed in place, so that unchanged
+        parts, and their open editors, are kept. Each model notifies its changes at once, to refresh
+        the whole tree atomically run it within bulk_update().
+        The time taken grows with the changes, not with the size of the data: beyond digesting the
+        new source once, unchanged sub models and lists are skipped through their cached fingerprints"""
+    #--------------------------------------------------------------------------------------------------
+        try:
+            props = vars(obj)
+        except TypeError:
+            props = obj
+        else:
+            self.__orig_obj = obj
+
+        d = self.__dict__
+        with _FingerprintMemo():
+            if _fingerprint( self ) == _fingerprint( obj ):
+                #Same data, the sub models are only bound to their new source objects
+                for key, val in props.iteritems():
+                    current = d.get( key )
+                    if isinstance( current, HasTraits ) and not key.startswith('_'):
+                        _refresh_field( current, val )
+                return self
+
+            with BulkUpdate( self, deep=False ):
+                changed = {}
+                for key, val in props.iteritems():
+                    if key.startswith('_') or key == "Templates" or val is None: continue
+                    current = d.get( key, _unset )
+                    ctrait = self.trait( key )
+                    if ctrait is None:  #New field, left to set_init()
+                        changed[key] = val
+                        continue
+                    if current is _unset and isinstance( ctrait.handler, Instance ):
+                        current = getattr( self, key )  #Default sub model, which can be refreshed
+                    if current is not _unset and _refresh_field( current, val ):
+                        continue
+                    changed[key] = val
+                if changed:
+                    self.set_init( changed )
+                #Fields the source no longer has (or has as None) go back to their default. Attributes
+                #without a declared trait are cleared instead
+                for name in [ name for name in d if not name.startswith('_') and props.get( name ) is None ]:
+                    ctrait = self.trait( name )
+                    if ctrait is None or name == "Templates" or ctrait.private or ctrait.type == 'event':
+                        continue
+                    if ctrait.type == 'python':
+                        setattr( self, name, None )
+                    else:
+                        self.reset_traits( [name] )
+        return self
+    
+    
+    #--------------------------------------------------------------------------------------------------
+    def default_traits_view( self ):
+        """The View of models without a declared one, shared by all the models with the same fields"""
+    #--------------------------------------------------------------------------------------------------
+        if self.trait_view_elements().filter_by():
+            return HasTraits.default_traits_view( self )
+        return _cached_view( sorted( self.visible_traits() ), self.trait )
+    
+
     #--------------------------------------------------------------------------------------------------
     def __repr__(self):
         "The string representation of the object"
@@ -302,6 +523,11 @@ class ListClassModel(ClassModel):
         if orig_class is not None:
             self._orig_class = orig_class
         orig_class = self._orig_class
+        if orig_class is None and obj is not None and _is_list( obj ) and len( obj ):
+            #Lists declared without it (e.g. from a schema) convert back to the source elements type
+            t = _type_func( obj[0] )
+            if t not in _registered_base_types and not issubclass( t, (HasTraits, dict) ):
+                orig_class = self._orig_class = t
         if orig_class is None:
             log( LOG_LEVEL.INFO, "List ", self.__class__.__name__, "does not have a original type to convert back")
 
@@ -313,16 +539,31 @@ class ListClassModel(ClassModel):
         self.add_trait('_matrix', List(t_edit, editor=ListEditor() ) )
         
         if obj is not None and _is_list( obj ):
-            #self._matrix = obj 
-            for elem in obj:
-                
-                if trait_t == Any or isinstance(elem,trait_t):
-                    self.append( elem )
-                else:
-                    #try:
-                    self.append( trait_t( elem ) )
-                    #except Exception as e:
-                    #    log( LOG_LEVEL.WARN, "Element cant be converted to type", elem, trait_t.__class__, "Error:", str(e) )
+            #Converted elements are assigned at once, validating and notifying a single time
+            self._matrix = [ self._convert( elem ) for elem in obj ]
+    
+    
+    #--------------------------------------------------------------------------------------------------
+    def _convert( self, elem ):
+        """Converts a source element to the list inner type"""
+    #--------------------------------------------------------------------------------------------------
+        trait_t = self._inner_type
+        if trait_t == Any or isinstance( elem, trait_t ):
+            return elem
+        return trait_t( elem )
+    
+    
+    #--------------------------------------------------------------------------------------------------
+    def refresh_from( self, obj ):
+        """Updates the list to the changed source list. Only the elements which differ are
+        refreshed, inserted or removed. See ClassModel.refresh_from()"""
+    #--------------------------------------------------------------------------------------------------
+        with _FingerprintMemo():
+            if _fingerprint( self ) == _fingerprint( obj ):
+                return self
+            with BulkUpdate( self, deep=False ):
+                _sync_list( self._matrix, obj, self._convert )
+        return self
         
     
     #--------------------------------------------------------------------------------------------------
@@ -340,8 +581,8 @@ class ListClassModel(ClassModel):
     def append( self, obj ):
         self._matrix.append( obj )
     
-    def get_object( self, as_dict=False ):
-        return [ GenericTrait.cast_back(elem, self._orig_class) for elem in self._matrix]
+    def get_object( self, as_dict=False, compact=False ):
+        return [ GenericTrait.cast_back(elem, self._orig_class, compact) for elem in self._matrix]
     #//eof----------------------------------------------------------------------------------------------
 
     #The gui editor will only display the list with the "custom" editor
@@ -349,6 +590,120 @@ class ListClassModel(ClassModel):
 
 
 
+#==================================================================================================
+#--------------------------------------------------------------------------------------------------
+class UnionListClassModel(ListClassModel):
+    """ A Trait class type for Lists of objects of a few different types, e.g. several record types.
+        Elements are grouped by type and each group is converted at once, with the model of its type,
+        keeping the original order. New elements of any of the types can be added.
+    """
+#--------------------------------------------------------------------------------------------------
+    _inner_type  = Any( HasTraits, private=True )
+    _members     = Any( private=True )  #source type -> model, in order of appearance
+    _origins     = Any( private=True )  #model -> source type, for converting back
+    _model_names = List( Str, private=True )
+    AddType = Enum( values='_model_names', private=True )
+    Add     = Button( "Add", private=True )
+    
+    #--------------------------------------------------------------------------------------------------
+    def __init__(self, obj=None, **kw ):
+        """UnionListClassModel contructor. Accepts the list initialization, the member types are
+           the types of its elements"""
+    #--------------------------------------------------------------------------------------------------
+        ClassModel.__init__(self, None, **kw)
+        self._members, self._origins = {}, {}
+        self.add_trait('_matrix', List( Instance(HasTraits), editor=ListEditor(use_notebook=True, deletable=True) ) )
+        if obj is None or not _is_list( obj ):
+            return
+        
+        groups = {}
+        for i, elem in enumerate( obj ):
+            groups.setdefault( _type_func(elem), [] ).append( i )
+        matrix = list( obj )
+        for t, positions in sorted( groups.iteritems(), key=lambda group: group[1][0] ):
+            if issubclass( t, HasTraits ): continue  #Already models
+            model = self._add_member( t, _sample_for_inference( [ obj[i] for i in positions ] ) )
+            for i in positions:
+                matrix[i] = model( obj[i] )
+        #Converted elements are assigned at once, validating and notifying a single time
+        self._matrix = matrix
+    
+    
+    #--------------------------------------------------------------------------------------------------
+    def _add_member( self, t, samples ):
+        """Registers the model for elements of type t, inferred from the samples if dynamic"""
+    #--------------------------------------------------------------------------------------------------
+        model = _model_for_elements( t, samples )
+        if model is None:
+            raise TraitError( "Elements of type %s cant be converted to a model" % t.__name__ )
+        self._members[t] = model
+        self._origins[model] = t
+        self._model_names.append( model.__name__ )
+        return model
+    
+    
+    #--------------------------------------------------------------------------------------------------
+    def _convert( self, elem ):
+        """Converts a source element to the model of its type, registering new types"""
+    #--------------------------------------------------------------------------------------------------
+        if isinstance( elem, HasTraits ):
+            return elem
+        t = _type_func( elem )
+        model = self._members.get( t ) or self._add_member( t, [elem] )
+        return model( elem )
+    
+    
+    #--------------------------------------------------------------------------------------------------
+    def _refresh_member( self, current, value ):
+        """Refreshes an element in place, only from a source of the same type"""
+    #--------------------------------------------------------------------------------------------------
+        model = self._members.get( _type_func(value) )
+        if model is None or not isinstance( current, model ):
+            return False
+        return _refresh_in_place( current, value )
+    
+    
+    #--------------------------------------------------------------------------------------------------
+    def refresh_from( self, obj ):
+        """Updates the list to the changed source list. See ListClassModel.refresh_from()"""
+    #--------------------------------------------------------------------------------------------------
+        with _FingerprintMemo():
+            if _fingerprint( self ) == _fingerprint( obj ):
+                return self
+            with BulkUpdate( self, deep=False ):
+                _sync_list( self._matrix, obj, self._convert, self._refresh_member )
+        return self
+    
+    
+    #--------------------------------------------------------------------------------------------------
+    def _Add_fired( self ):
+        """Appends a new element of the selected type"""
+    #--------------------------------------------------------------------------------------------------
+        for model in self._origins:
+            if model.__name__ == self.AddType:
+                self._matrix.append( model() )
+                return
+    
+    
+    #--------------------------------------------------------------------------------------------------
+    def get_object( self, as_dict=False, compact=False ):
+    #--------------------------------------------------------------------------------------------------
+        return [ GenericTrait.cast_back( elem, self._origin_of(elem), compact ) for elem in self._matrix ]
+    
+    def _origin_of( self, elem ):
+        origin = self._origins.get( type(elem) )
+        if origin is None:
+            #Models extended meanwhile are subclasses
+            origin = next( (t for model, t in self._origins.iteritems() if isinstance(elem, model)), None )
+        return origin
+    #//eof----------------------------------------------------------------------------------------------
+
+    traits_view = View( Item("_matrix", style="custom", show_label=False),
+                        HGroup( Item("AddType", show_label=False), Item("Add", show_label=False) ),
+                        resizable=True, buttons=["OK", "Cancel"])
+
+
+
 
 #==================================================================================================
 #--------------------------------------------------------------------------------------------------
@@ -361,6 +716,10 @@ class GenericTrait( HasTraits ):
     __orig_obj = Any(None, private=True)
     __is_list = Bool(private=True)
     __is_dict = Bool(False, private=True)
+    bulk_updated = Event( private=True )  #Fired once per committed bulk_update(), with the changes
+    _path_index  = Any( None, private=True )
+    _fingerprint_cache   = Any( None, private=True, transient=True )  #See _model_fingerprint()
+    _fingerprint_holders = Any( None, private=True, transient=True )
 
     #--------------------------------------------------------------------------------------------------
     def __init__(self, obj, as_list=False ):
@@ -433,18 +792,42 @@ class GenericTrait( HasTraits ):
         
         return setattr( self, 'pos' + str(key), value )
 
+    #--------------------------------------------------------------------------------------------------
+    def bulk_update( self, **traits ):
+        """Transaction over the object and all its sub objects, to be used as a context manager.
+        See BulkUpdate"""
+    #--------------------------------------------------------------------------------------------------
+        return BulkUpdate( self, traits )
+
+    #--------------------------------------------------------------------------------------------------
+    # Path expressions, as in ClassModel
+    #--------------------------------------------------------------------------------------------------
+    def get_path( self, path ):
+        """Gets the value at a path relative to this object. See ClassModel.select()"""
+        return _path_index_of( self ).get( path )
+
+    def set_path( self, path, value ):
+        """Sets the value of the fields matching the path. See ClassModel.set_path()"""
+        return _path_index_of( self ).set( path, value )
+
+    def select( self, pattern ):
+        """Returns [(path, value)] of the fields matching the pattern. See ClassModel.select()"""
+        return _path_index_of( self ).select( pattern )
+
     
     #--------------------------------------------------------------------------------------------------
-    def get_object( self, as_dict=False ):
+    def get_object( self, as_dict=False, compact=False ):
         """Returns the object, either its data in dict form (as_dict=True)
-        or the updated original object (default)"""
+        or the updated original object (default), or a new record of its fields (compact=True)"""
     #--------------------------------------------------------------------------------------------------
         elems=self.get( private=is_none )
-        elems=dict( (key, self.cast_back(value) ) for key,value in elems.iteritems() )
+        elems=dict( (key, self.cast_back(value, compact=compact) ) for key,value in elems.iteritems() )
 
         if not self.__is_list:
             if as_dict or self.__is_dict:
                 return elems 
+            if compact:
+                return _compact_record( _type_func(self.__orig_obj).__name__, elems )
             self.__orig_obj.__dict__.update( elems )
             return self.__orig_obj
         else:
@@ -453,12 +836,72 @@ class GenericTrait( HasTraits ):
             return [ elems[key] for key in keys ]
 
 
+    #--------------------------------------------------------------------------------------------------
+    def refresh_from( self, obj ):
+        """Updates the object to a changed version of the source. Fields (or list positions) which
+        appeared or disappeared are added or removed, the others are refreshed in place as in
+        ClassModel.refresh_from()"""
+    #--------------------------------------------------------------------------------------------------
+        if self.__is_list:
+            props = dict( ('pos'+str(i), value) for i, value in enumerate(obj) )
+        else:
+            try:
+                props = vars(obj)
+                self.__orig_obj = obj
+            except TypeError:
+                props = obj
+        props = dict( (key, value) for key, value in props.iteritems() if not key.startswith('_') )
+        current = set( self.trait_names( private=is_none, type=not_event ) )
+
+        retyped = {}
+        with _FingerprintMemo():
+            if current == set( props ) and _fingerprint( self ) == _fingerprint( obj ):
+                #Same data, the sub objects are only bound to their new source objects
+                for key, val in props.iteritems():
+                    old = getattr( self, key )
+                    if isinstance( old, HasTraits ):
+                        _refresh_field( old, val )
+                return self
+            with BulkUpdate( self, deep=False ):
+                for key in current.intersection( props ):
+                    old, val = getattr( self, key ), props[key]
+                    if _refresh_field( old, val ):
+                        continue
+                    try:
+                        setattr( self, key, val )
+                    except TraitError:
+                        retyped[key] = val  #The type changed, so must the trait
+
+        for key in current.difference( props ).union( retyped ):
+            self.trait_property_changed( key, getattr(self, key), None )  #For listeners on the field
+            self.remove_trait( key )
+        added = dict( (key, props[key]) for key in set(props).difference( current ) )
+        added.update( retyped )
+        if added:
+            self.set( **self._create_get_traits( self.add_trait, added ) )
+        return self
+
+
+    #--------------------------------------------------------------------------------------------------
+    def default_traits_view( self ):
+        """The View of generic objects, shared by all the objects with the same fields. See ClassModel"""
+    #--------------------------------------------------------------------------------------------------
+        if self.trait_view_elements().filter_by():
+            return HasTraits.default_traits_view( self )
+        if self.__is_list:
+            names = sorted( self.visible_traits(), key=lambda name: int(name[3:]) )
+        else:
+            names = sorted( self.visible_traits() )
+        return _cached_view( names, self.trait )
+
+
     
     @staticmethod
     #--------------------------------------------------------------------------------------------------
-    def cast_back( obj, cast_to=None ):
+    def cast_back( obj, cast_to=None, compact=False ):
         """Class function which returns the correct representation of a value, even if it has to
-        recursivelly convert it by calling the obj get_object() method"""
+        recursivelly convert it by calling the obj get_object() method.
+        With compact=True objects are returned as records (see CompactObject), ignoring cast_to"""
     #--------------------------------------------------------------------------------------------------
         t = _type_func(obj)
         if t in _registered_base_types:
@@ -469,6 +912,8 @@ class GenericTrait( HasTraits ):
                 return list(obj)
             
             #else (returns)
+            if compact:
+                return obj.get_object( compact=True )
             if cast_to is None:
                 return obj.get_object()
             
@@ -481,7 +926,462 @@ class GenericTrait( HasTraits ):
             else:
                 new_obj.__dict__.update( obj.get_object(as_dict=True)  )
                 return new_obj
-            
+
+
+
+#==================================================================================================
+#--------------------------------------------------------------------------------------------------
+class WideGenericTrait( GenericTrait ):
+    """ A GenericTrait for objects with a very large number of fields, e.g. configuration maps.
+        Fields are kept in a sorted index and displayed page by page, optionally filtered by name.
+        Traits and editors are only created for the fields in the current page, so opening the
+        object costs about the same regardless of the number of fields.
+    """
+#--------------------------------------------------------------------------------------------------
+    Filter      = Str( private=True )
+    Filter_mode = Enum( 'substring', 'prefix', private=True )
+    Page        = Int( 1, private=True )
+    Pages       = Int( 1, private=True )
+    page_fields = Instance( HasTraits, private=True )
+
+    _values  = Any( private=True )  #field -> value (or its converted trait object)
+    _index   = Any( private=True )  #sorted field names
+    _matches = Any( private=True )  #sorted field names matching the current filter
+
+    traits_view = View( Item('Filter'), Item('Filter_mode', label="Match"),
+                        Item('Page'), Item('Pages', style='readonly'),
+                        Item('page_fields', style='custom', show_label=False, editor=InstanceEditor()),
+                        resizable=True, buttons=["OK", "Cancel"] )
+
+    #--------------------------------------------------------------------------------------------------
+    def __init__(self, obj):
+        """Contructor for a wide generic trait. Accepts an object or dict, used for initialization"""
+    #--------------------------------------------------------------------------------------------------
+        HasTraits.__init__(self)
+        try:
+            obj_props = vars(obj)
+            self._GenericTrait__orig_obj = obj
+        except TypeError:
+            obj_props = obj
+            self._GenericTrait__is_dict = True
+
+        self._values = dict( (k, v) for k, v in obj_props.iteritems() if not k.startswith('_') )
+        self._index = self._matches = sorted( self._values )
+        self._show_page()
+
+
+    #--------------------------------------------------------------------------------------------------
+    def _Filter_changed(self, old, new):
+        """Filters the field names. A narrower filter only looks into the previous matches"""
+    #--------------------------------------------------------------------------------------------------
+        if not new:
+            self._matches = self._index
+        elif self.Filter_mode == 'prefix':
+            #Sorted index -> prefix is a range
+            start = bisect.bisect_left( self._index, new )
+            end = bisect.bisect_left( self._index, new + u'\uffff' )
+            self._matches = self._index[start:end]
+        else:
+            candidates = self._matches if old and old in new else self._index
+            self._matches = [ name for name in candidates if new in name ]
+        self.Page = 1
+        self._show_page()
+
+    def _Filter_mode_changed(self):
+        self._Filter_changed( '', self.Filter )
+
+    def _Page_changed(self, new):
+        page = min( max(1, new), self.Pages )
+        if page != new:
+            self.Page = page
+        else:
+            self._show_page()
+
+
+    #--------------------------------------------------------------------------------------------------
+    def _show_page(self):
+        """Creates the traits object holding the fields in the current page"""
+    #--------------------------------------------------------------------------------------------------
+        page_size = _wide.page_size
+        self.Pages = max( 1, (len(self._matches) + page_size - 1) // page_size )
+        names = self._matches[ (self.Page-1) * page_size : self.Page * page_size ]
+
+        page = HasTraits()
+        page_props = dict( (name, self._values[name]) for name in names )
+        new_traits = self._create_get_traits( page.add_trait, page_props )
+        page.set( **new_traits )
+        #Keep the converted values (sub objects, trait lists), so that edits are not lost
+        for name in names:
+            self._values[name] = getattr( page, name )
+        page.on_trait_change( self._field_edited )
+        self.page_fields = page
+
+    def _field_edited(self, name, new):
+        if name in self._values:
+            self._values[name] = new
+
+
+    #--------------------------------------------------------------------------------------------------
+    def refresh_from( self, obj ):
+        """Updates the fields to a changed version of the source. The current page is only rebuilt
+        if one of its fields changed, and the filter is reapplied if fields appeared or disappeared"""
+    #--------------------------------------------------------------------------------------------------
+        try:
+            props = vars(obj)
+            self._GenericTrait__orig_obj = obj
+        except TypeError:
+            props = obj
+        props = dict( (key, value) for key, value in props.iteritems() if not key.startswith('_') )
+
+        changed = []
+        with _FingerprintMemo():
+            for key, val in props.iteritems():
+                current = self._values.get( key, _unset )
+                if current is not _unset and _refresh_field( current, val ):
+                    continue
+                self._values[key] = val
+                changed.append( key )
+        removed = set( self._values ).difference( props )
+        for key in removed:
+            del self._values[key]
+
+        if removed or len( self._values ) != len( self._index ):
+            self._index = sorted( self._values )
+            self._Filter_changed( '', self.Filter )
+        elif self.page_fields is not None and any( self.page_fields.trait(key) is not None for key in changed ):
+            self._show_page()
+        return self
+
+
+    #--------------------------------------------------------------------------------------------------
+    def visible_traits(self):
+        return [ 'Filter', 'Filter_mode', 'Page', 'Pages', 'page_fields' ]
+
+    def get_object( self, as_dict=False, compact=False ):
+        """Returns the object, either its data in dict form (as_dict=True)
+        or the updated original object (default), or a new record of its fields (compact=True)"""
+    #--------------------------------------------------------------------------------------------------
+        elems = dict( (key, self.cast_back(value, compact=compact) if isinstance(value, (HasTraits, TraitListObject)) else value)
+                      for key, value in self._values.iteritems() )
+        if as_dict or self._GenericTrait__is_dict:
+            return elems
+        if compact:
+            return _compact_record( _type_func(self._GenericTrait__orig_obj).__name__, elems )
+        self._GenericTrait__orig_obj.__dict__.update( elems )
+        return self._GenericTrait__orig_obj
+
+
+
+#==================================================================================================
+#--------------------------------------------------------------------------------------------------
+class BulkUpdate( object ):
+    """ A transaction over a tree of models (ClassModel, ListClassModel, GenericTrait and their
+        sub models), created with model.bulk_update() and used as a context manager:
+            with system.bulk_update( location="Bytes Av, 16" ):
+                system.users.append( User() )
+                system.admin.set_init( {'name':"F1", 'number':1} )
+        Traits given to bulk_update() are all validated before any change, errors are raised together.
+        During the block no notification is sent by the models in the tree. On success a single
+        notification is sent per changed trait, and the root model fires 'bulk_updated' with the list
+        of (model, trait name) changed. On exception every model is restored and nothing is notified.
+        A bulk_update() started within another one, over models of its tree, just joins it.
+        With deep=False only the root model is held, its sub models notify on their own. Given nodes,
+        only those models are held, leaving the ones already held by other bulk updates to them.
+    """
+#--------------------------------------------------------------------------------------------------
+    _active = weakref.WeakKeyDictionary()  #model -> BulkUpdate holding it
+
+    def __init__( self, root, traits=None, deep=True, nodes=None ):
+        self.root = root
+        self.traits = traits or {}
+        self.deep = deep
+        self.nodes = nodes
+        self._snapshot = None
+        self._joined = False
+
+
+    #--------------------------------------------------------------------------------------------------
+    def __enter__( self ):
+        """Validates the given traits, holds the notifications of the tree and sets the traits"""
+    #--------------------------------------------------------------------------------------------------
+        values = self._validate()
+        if self.root in self._active:
+            self._joined = True
+        else:
+            if self.nodes is not None:
+                nodes = [ node for node in self.nodes if node not in self._active ]
+            else:
+                nodes = _iter_model_tree( self.root ) if self.deep else [ self.root ]
+            self._snapshot = [ (node, _snapshot_model(node)) for node in nodes ]
+            for node, _ in self._snapshot:
+                node._trait_change_notify( False )
+                self._active[node] = self
+                _fingerprint_changed( node )  #Held models change silently, see _model_fingerprint()
+        try:
+            self.root.set( **values )
+        except:
+            self.__exit__( *sys.exc_info() )
+            raise
+        return self.root
+
+
+    #--------------------------------------------------------------------------------------------------
+    def __exit__( self, exc_type, exc_value, traceback ):
+        """Commits, notifying the changes, or rolls back in case of exception"""
+    #--------------------------------------------------------------------------------------------------
+        if self._joined:
+            return False
+        snapshot, self._snapshot = self._snapshot, None
+        for node, _ in snapshot:
+            self._active.pop( node, None )
+
+        if exc_type is not None:
+            changes = [ (node, [ name for name, _ in _model_changes(node, state) ]) for node, state in snapshot ]
+            for node, state in snapshot:
+                _restore_model( node, state )
+                node._trait_change_notify( True )
+            #Nothing is notified, but path indexes may have resolved the changed fields meanwhile
+            for node, names in changes:
+                if names:
+                    _PathIndex.invalidate( node, names )
+                    _fingerprint_changed( node )
+            log( LOG_LEVEL.INFO, "Bulk update of", self.root.__class__.__name__, "rolled back:", str(exc_value) )
+            return False
+
+        changes = [ (node, name, old) for node, state in snapshot for name, old in _model_changes(node, state) ]
+        for node, _ in snapshot:
+            node._trait_change_notify( True )
+        for node, name, old in changes:
+            node.trait_property_changed( name, old, getattr(node, name) )
+        if changes:
+            self.root.bulk_updated = [ (node, name) for node, name, _ in changes ]
+        return False
+
+
+    #--------------------------------------------------------------------------------------------------
+    def apply( self ):
+        """Runs the transaction at once, only setting the given traits. Returns the model"""
+    #--------------------------------------------------------------------------------------------------
+        with self:
+            pass
+        return self.root
+
+
+    #--------------------------------------------------------------------------------------------------
+    def _validate( self ):
+        """Validates all the given traits, converting objects to the field model where needed, as
+        set_init() does. Raises TraitError describing all the invalid values"""
+    #--------------------------------------------------------------------------------------------------
+        values, errors = {}, []
+        for name, value in self.traits.iteritems():
+            try:
+                values[name] = _validate_field( self.root, name, value )
+            except Exception as e:
+                errors.append( "%s: %s" % (name, e) )
+        if errors:
+            raise TraitError( "Invalid values for %s. %s" % (self.root.__class__.__name__, "; ".join(errors)) )
+        return values
+
+
+
+#==================================================================================================
+#--------------------------------------------------------------------------------------------------
+class _PathIndex( object ):
+    """ Index of the sub models and lists of a root model by path (tuples of field names and list
+        positions), backing get_path(), set_path() and select().
+        It is built lazily, paths are added as they are resolved. Indexed models are listened to:
+        when a field changes, the paths below it are dropped, to be resolved again when used.
+        Changes made without notifying (set_init, rollbacks) are reported with invalidate(). Below
+        models held by a bulk update, which dont notify meanwhile, paths are resolved without the index.
+        Fields of WideGenericTraits are not indexed, since they change without notifying.
+    """
+#--------------------------------------------------------------------------------------------------
+    _indexed = weakref.WeakKeyDictionary()  #model -> change handlers of the indexes holding it
+
+    def __init__( self, root ):
+        self.root = root
+        self.nodes = { (): root }  #path -> model or list
+        self.owner = {}            #path -> (model path, field) holding it
+        self.below = {}            #model path -> {field: paths held by that field}
+        self.listeners = {}        #model path -> change handler
+        self._listen( (), root )
+
+
+    #--------------------------------------------------------------------------------------------------
+    @classmethod
+    def invalidate( cls, model, names ):
+        """Drops the paths below the given fields of a model, changed without notifying"""
+    #--------------------------------------------------------------------------------------------------
+        for changed in list( cls._indexed.get( model, () ) ):
+            for name in names:
+                changed( name, None )
+
+
+    #--------------------------------------------------------------------------------------------------
+    def get( self, path ):
+        """The value at a path without wildcards"""
+    #--------------------------------------------------------------------------------------------------
+        segments = _parse_path( path )
+        if not segments:
+            return self.root
+        if '*' in segments or '[*]' in segments:
+            raise FormsException( "Path %s has wildcards, use select()" % path )
+        parent = self.resolve( segments[:-1] )
+        return _path_child( parent, segments[-1], segments )
+
+
+    #--------------------------------------------------------------------------------------------------
+    def select( self, pattern ):
+        """[(path, value)] of all the fields or elements matching the pattern, in order"""
+    #--------------------------------------------------------------------------------------------------
+        return [ (_path_string(path), value) for path, value, _ in self.expand( _parse_path(pattern) ) ]
+
+
+    #--------------------------------------------------------------------------------------------------
+    def set( self, pattern, value ):
+        """Validates the value for every field matching the pattern, then sets them in one bulk update"""
+    #--------------------------------------------------------------------------------------------------
+        segments = _parse_path( pattern )
+        if not segments:
+            raise FormsException( "The root model itself cant be set" )
+        wild = '*' in segments or '[*]' in segments
+        targets = [ (parent, path[-1], path) for parent_path, parent, cached in self.expand( segments[:-1] )
+                    for path, _, _ in self._step( parent_path, parent, segments[-1], wild, cached ) ]
+        if not targets:
+            raise FormsException( "No field matches %s" % pattern )
+
+        values, errors = [], []
+        for parent, key, path in targets:
+            try:
+                values.append( (parent, key, _path_validate( parent, key, value )) )
+            except Exception as e:
+                errors.append( "%s: %s" % (_path_string(path), e) )
+        if errors:
+            raise TraitError( "Invalid value for %s. %s" % (pattern, "; ".join(errors)) )
+
+        #Only the models written are held, not the whole tree
+        holders = dict( (id(holder), holder) for holder in
+                        ( self._holder(path[:-1], parent) for parent, _, path in targets ) )
+        with BulkUpdate( self.root, nodes=holders.values() ):
+            for parent, key, new in values:
+                _path_assign( parent, key, new )
+        return len( values )
+
+    def _holder( self, path, node ):
+        "The model holding the values of a node: itself, the owner of a list trait, or its nearest model"
+        while not isinstance( node, HasTraits ):
+            if isinstance( node, TraitListObject ):
+                return node.object()
+            path = path[:-1]
+            node = self.resolve( path )
+        return node
+
+
+    #--------------------------------------------------------------------------------------------------
+    def resolve( self, segments ):
+        """The node at a path without wildcards"""
+    #--------------------------------------------------------------------------------------------------
+        if BulkUpdate._active:
+            #Checking the models on the path, from the root
+            node, cached = self.root, True
+            for j, seg in enumerate( segments ):
+                (_, node, cached), = self._step( segments[:j], node, seg, False, cached )
+            return node
+        #From the deepest indexed ancestor
+        i = len( segments )
+        while segments[:i] not in self.nodes:
+            i -= 1
+        node = self.nodes[ segments[:i] ]
+        for j in range( i, len(segments) ):
+            node = _path_child( node, segments[j], segments[:j+1] )
+            self._add( segments[:j+1], node )
+        return node
+
+
+    #--------------------------------------------------------------------------------------------------
+    def expand( self, segments ):
+        """[(path, value, cached)] matching the segments. Branches without the requested fields are
+        skipped after a wildcard, otherwise FormsException is raised"""
+    #--------------------------------------------------------------------------------------------------
+        matches = [ ((), self.root, True) ]
+        wild = False
+        for seg in segments:
+            wild = wild or seg in ('*', '[*]')
+            matches = [ child for path, node, cached in matches
+                        for child in self._step( path, node, seg, wild, cached ) ]
+        return matches
+
+    def _step( self, path, node, seg, wild, cached ):
+        """[(path, value, cached)] of the children of a node matching a segment. The index is only
+        used (cached) while no model on the path is held by a bulk update"""
+        held = BulkUpdate._active
+        cached = cached and not ( held and isinstance( node, HasTraits ) and node in held )
+        if seg in ('*', '[*]'):
+            children = [ (path + (key,), value) for key, value in _path_children( node, seg ) ]
+        else:
+            child = path + (seg,)
+            value = self.nodes.get( child, _unset ) if cached else _unset
+            if value is _unset:
+                try:
+                    value = _path_child( node, seg, child )
+                except FormsException:
+                    if wild: return []
+                    raise
+            children = [ (child, value) ]
+        if cached:
+            for child, value in children:
+                self._add( child, value )
+        return [ (child, value, cached) for child, value in children ]
+
+
+    #--------------------------------------------------------------------------------------------------
+    def _add( self, path, node ):
+        """Indexes a model or list, registering it under the field of the model holding it"""
+    #--------------------------------------------------------------------------------------------------
+        if path in self.nodes or not isinstance( node, (HasTraits, TraitListObject) ): return
+        parent_path, key = path[:-1], path[-1]
+        parent = self.nodes.get( parent_path )
+        if parent is None or isinstance( parent, WideGenericTrait ): return
+
+        if isinstance( parent, HasTraits ):
+            if isinstance( key, int ):
+                key = '_matrix' if isinstance( parent, ListClassModel ) else 'pos' + str(key)
+            owner = ( parent_path, key )
+        else:
+            owner = self.owner[ parent_path ]  #Elements of a list trait: its model field
+        self.nodes[path] = node
+        self.owner[path] = owner
+        self.below.setdefault( owner[0], {} ).setdefault( owner[1], set() ).add( path )
+        if isinstance( node, HasTraits ):
+            self._listen( path, node )
+
+    def _listen( self, path, node ):
+        index_ref = weakref.ref( self )  #Listeners dont keep the index, and so its models, alive
+        def changed( name, new ):
+            index = index_ref()
+            if index is None: return
+            if name.endswith( '_items' ):
+                name = name[:-6]
+            for dropped in list( index.below.get( path, {} ).pop( name, () ) ):
+                index._drop( dropped )
+        node.on_trait_change( changed )
+        self.listeners[path] = changed
+        self._indexed.setdefault( node, [] ).append( changed )
+
+    def _drop( self, path ):
+        """Removes a path, and all the paths below it, from the index"""
+        node = self.nodes.pop( path, None )
+        if node is None: return
+        owner = self.owner.pop( path )
+        self.below.get( owner[0], {} ).get( owner[1], set() ).discard( path )
+        listener = self.listeners.pop( path, None )
+        if listener is not None:
+            node.on_trait_change( listener, remove=True )
+            self._indexed.get( node, [] ).remove( listener )
+        for paths in self.below.pop( path, {} ).values():
+            for below in list( paths ):
+                self._drop( below )
+
 
 
 #==================================================================================================
@@ -520,9 +1420,15 @@ class BaseTypes(object):
 #--------------------------------------------------------------------------------------------------
     def __init__(self, dic):
         self.dic = dict(dic)
+        self._subclass = {}  #type -> whether it subclasses a base type, most lookups are of models
 
     def __contains__(self, val):
-        return any( [ issubclass(val, t) for t in self.dic.iterkeys() ] )
+        if val in self.dic:
+            return True
+        known = self._subclass.get( val )
+        if known is None:
+            known = self._subclass[val] = any( issubclass(val, t) for t in self.dic.iterkeys() )
+        return known
     
     def __getitem__(self, key):
         for k,v in self.dic.iteritems():
@@ -550,31 +1456,157 @@ def _setClassListOf( innerClass, new_class ):
 
 def _get_or_create_ClassListOf( innerClass, orig_class=None ):
     name = "ListOf" + getattr(innerClass, '__name__')
-    return __dynamically_created_classes.get( name ) \
-           or _create_ListClass( name, innerClass, orig_class=orig_class )
+    listClass = __dynamically_created_classes.get( name )
+    if listClass is None:
+        with _classes_lock:
+            listClass = __dynamically_created_classes.get( name ) \
+                        or _create_ListClass( name, innerClass, orig_class=orig_class )
+    return listClass
 
 def _create_ListClass( name, innerClass, orig_class=None ):
     log( LOG_LEVEL.DEBUG, "   > Creating dynamic ListClass", name )
     def init(m_self, obj=None, **kw):
         ListClassModel.__init__(m_self, obj, innerClass, **kw)
-    listClass = type(name, (ListClassModel,), dict( __init__ = init, _orig_class=orig_class ) )
+    listClass = type(name, (ListClassModel,), dict( __init__ = init, _inner_type=innerClass, _orig_class=orig_class ) )
     __dynamically_created_classes[name] = listClass
     return listClass
 
-def _create_ModelClass( name, obj ):
+def _create_ModelClass( name, obj, samples=None ):
     log( LOG_LEVEL.DEBUG, "   > Creating dynamic model", name )
-    obj_props = vars(obj) #Objects only in here. Dicts must turn into GenericTrait
+    #Objects only in here. Dicts must turn into GenericTrait
+    obj_props, merged_traits = _merge_sampled_props( samples or [obj] )
     def init(m_self, m_obj=None, **kw):
         ClassModel.__init__(m_self, m_obj, **kw )
     newClassModel = type(name, (ClassModel,), dict( __init__ = init, ) )
     GenericTrait._create_get_traits( newClassModel.add_class_trait, obj_props )
+    for key, trait_t in merged_traits.iteritems():
+        newClassModel.add_class_trait( key, trait_t )
     __dynamically_created_classes[name] = newClassModel
     return newClassModel
 
-def get_or_create_ModelClass_for_obj( obj ):
+def _extend_ModelClass( model, samples ):
+    """Returns the dynamic model with the fields seen in the samples which it doesnt have yet.
+    The model is not modified (instances may be in use), a derived class replaces it instead"""
+    obj_props, merged_traits = _merge_sampled_props( samples )
+    class_traits = model.class_traits()
+    new_props = dict( (k, v) for k, v in obj_props.iteritems() if k not in class_traits )
+    new_traits = dict( (k, t) for k, t in merged_traits.iteritems() if k not in class_traits )
+    if not new_props and not new_traits:
+        return model
+    log( LOG_LEVEL.DEBUG, "   > Extending dynamic model", model.__name__, "with", new_props.keys() + new_traits.keys() )
+    extended = type( model.__name__, (model,), {} )
+    GenericTrait._create_get_traits( extended.add_class_trait, new_props )
+    for key, trait_t in new_traits.iteritems():
+        extended.add_class_trait( key, trait_t )
+    __dynamically_created_classes[model.__name__] = extended
+    #The list class of the previous model is recreated on demand
+    __dynamically_created_classes.pop( "ListOf" + model.__name__, None )
+    return extended
+
+def _has_new_fields( model, samples ):
+    """Whether the samples have fields the model doesnt have, within the inference budget as
+    _merge_sampled_props(). Doesnt lock, classes are not modified once registered"""
+    fields = model.__class_traits__
+    cost = 0
+    for i, obj in enumerate( samples ):
+        try:
+            obj_props = vars(obj)
+        except TypeError:
+            obj_props = obj
+        cost += len(obj_props)
+        if cost > _inference.budget and i:
+            break
+        for key in obj_props:
+            if key not in fields and not key.startswith('_'):
+                return True
+    return False
+
+def get_or_create_ModelClass_for_obj( obj, samples=None ):
     t_name = _type_func( obj ).__name__
-    return __dynamically_created_classes.get( t_name ) \
-           or _create_ModelClass( t_name, obj )
+    model = __dynamically_created_classes.get( t_name )
+    if model is not None and (samples is None or not _has_new_fields( model, samples )):
+        return model
+    with _classes_lock:
+        model = __dynamically_created_classes.get( t_name )
+        if model is None:
+            return _create_ModelClass( t_name, obj, samples )
+        return _extend_ModelClass( model, samples )
+
+
+#==================================================================================================
+def _sample_for_inference( seq ):
+    """Returns the elements of a list to be used for type inference, according to the configured
+    strategy. Lists not bigger than the sample size are always completely used."""
+#--------------------------------------------------------------------------------------------------
+    size = _inference.sample_size
+    if _inference.strategy == 'full' or len(seq) <= size:
+        return list(seq)
+    if _inference.strategy == 'first':
+        return [ seq[0] ]
+    if _inference.strategy == 'reservoir':
+        try:
+            #First element always in, so that the model is consistent with the first element shown
+            return [ seq[i] for i in [0] + sorted( random.sample( xrange(1, len(seq)), size-1 ) ) ]
+        except TypeError:
+            #Not indexable, do a real reservoir sampling
+            sample = []
+            for i, elem in enumerate( seq ):
+                if i < size:
+                    sample.append( elem )
+                else:
+                    j = random.randint( 1, i )
+                    if j < size:
+                        sample[j] = elem
+            return sample
+    return list( itertools.islice( seq, size ) )
+
+
+#==================================================================================================
+def _merge_sampled_props( samples ):
+    """Merges the properties of several objects of the same type into a single set of fields.
+    Returns the props (with the first non-None value found as representative) and the traits
+    for the fields whose types differ among samples.
+    Merging stops once the budget (number of fields inspected) is exhausted."""
+#--------------------------------------------------------------------------------------------------
+    props = {}
+    field_types = {}
+    cost = 0
+    for obj in samples:
+        try:
+            obj_props = vars(obj)
+        except TypeError:
+            obj_props = obj
+        cost += len(obj_props)
+        if cost > _inference.budget and props:
+            log( LOG_LEVEL.DEBUG, "   > Inference budget exhausted" )
+            break
+
+        for key, value in obj_props.iteritems():
+            if key.startswith('_'): continue
+            if props.get(key) is None:
+                props[key] = value
+            if value is not None:
+                field_types.setdefault( key, set() ).add( _type_func(value) )
+
+    merged_traits = {}
+    for key, types in field_types.iteritems():
+        if len(types) > 1:
+            merged_traits[key] = _merge_types( types )
+            del props[key]
+    return props, merged_traits
+
+
+def _merge_types( types ):
+    "Returns the trait which can hold values of all the given types"
+    traits = set( _registered_base_types[t] for t in types )
+    if len(traits) == 1 and None not in traits:
+        return traits.pop()
+    #Numbers get the widest type
+    numeric = set([Complex, Float, Long, Int, Bool])
+    if traits <= numeric:
+        return next( t for t in (Complex, Float, Long, Int) if t in traits )
+    #Mixed object types are specialized when assigned
+    return Generic
     
 
 #==================================================================================================
@@ -605,24 +1637,166 @@ def get_obj_t( obj_t ):
     cls_name = obj_t.__name__
     return _api_types_to_trait.get( cls_name ) or \
             __dynamically_created_classes.get( cls_name )
-    
+
 
 
 
 ################################################################################################
-##  FUNCTIONS FOR LOOKUP AND DYNAMIC OBJECTS CREATION - Core generic trait logic 
-################################################################################################ 
+##  BATCH VALIDATION - Fast path for validating many base type values at once
+################################################################################################
 
 #==================================================================================================
-def create_list_trait( obj ):
-    """ Creates a Trait for a list-type object.
+# Per base trait: (types accepted as they are, types accepted after coercion, coercion function,
+#                  numpy dtype kinds accepted when validating with numpy)
+# Only exact types matching traits behavior are here. Anything else goes through the trait itself
+#==================================================================================================
+_batch_rules = {
+    Int     : ( (int,),                  (bool,),                       int,     'ib'   ),  #Not unsigned: uint64 values would wrap
+    Long    : ( (long,),                 (int, bool),                   long,    None   ),
+    Float   : ( (float,),                (int, long, bool),             float,   'iubf' ),
+    Complex : ( (complex,),              (int, bool, float),            complex, 'iubfc'),
+    Str     : ( (str, unicode),          (),                            None,    None   ),
+    CStr    : ( (str,),                  (int, long, bool, float, complex, unicode), str, None ),
+    Bool    : ( (bool,),                 (),                            None,    'b'    ),
+    Date    : ( (datetime.date, datetime.datetime), (),                 None,    None   ),
+    Time    : ( (datetime.time,),        (),                            None,    None   ),
+    #Python types, as in List(str), only accept the exact type
+    str     : ( (str,),                  (),                            None,    None   ),
+    int     : ( (int,),                  (),                            None,    None   ),
+    float   : ( (float,),                (),                            None,    None   ),
+    bool    : ( (bool,),                 (),                            None,    None   ),
+}
+# Sequences from this size are validated with numpy, if available
+_BATCH_NUMPY_MIN_SIZE = 1000
+
+#Generic traits used for the per value fallback
+_batch_ctraits = {}
+
+
+#==================================================================================================
+def validate_batch( trait_t, values, fallback=None ):
+    """Validates and coerces a sequence of values of a base trait type (Int, Float, Complex, Str,
+    CStr, Bool, Date, Time...) at once. Numeric sequences are handled by numpy when installed.
+    Only rejected values go through the per value validation, by fallback(index, value) when
+    given, or otherwise the trait type's own validation.
+    Returns the list of validated values, and the indices of the values that failed"""
+#--------------------------------------------------------------------------------------------------
+    keep, coerce, coerce_f, np_kinds = _batch_rules[trait_t]
+
+    if numpy is not None and np_kinds and len(values) >= _BATCH_NUMPY_MIN_SIZE:
+        arr = numpy.asarray( values )
+        if arr.ndim == 1 and arr.dtype.kind in np_kinds:
+            return arr.astype( numpy.dtype(keep[0]) ).tolist(), []
+
+    result = list( values )
+    rejected = []
+    for i, value in enumerate( result ):
+        t = type(value)
+        if t in keep:
+            continue
+        if t in coerce:
+            try:
+                result[i] = coerce_f( value )
+                continue
+            except (ValueError, UnicodeError):
+                pass
+        rejected.append( i )
+
+    if not rejected:
+        return result, []
+
+    if fallback is None:
+        ctrait = _batch_ctraits.get( trait_t )
+        if ctrait is None:
+            ctrait = _batch_ctraits[trait_t] = Trait( trait_t )
+        fallback = lambda i, value: ctrait.validate( None, None, value )
+
+    bad = []
+    for i in rejected:
+        try:
+            result[i] = fallback( i, result[i] )
+        except TraitError:
+            bad.append( i )
+    return result, bad
+
+
+def _batch_rule_for( handler ):
+    "Gets the batch rule key for a trait handler, or None if it must be validated by traits"
+    t = type(handler)
+    if t in _batch_rules:
+        return t
+    if t is TraitCoerceType and handler.aType in _batch_rules:
+        return handler.aType
+    if t is BaseInstance:
+        #Date and Time are instances, not classes
+        return { datetime.date: Date, datetime.time: Time }.get( handler.klass )
+    return None
+
+
+#==================================================================================================
+def _batch_validate_traits( model, traits, skip_keys ):
+    """Validates in batch all the base type values and base type lists of a traits dict, to be
+    assigned to model. Returns the validated values, and the validated lists as trait lists of
+    the model, to be stored as they are (assigning them would validate each element again).
+    The others are left for the per value path"""
+#--------------------------------------------------------------------------------------------------
+    validated, lists = {}, {}
+    groups = {}
+
+    for key, val in traits.iteritems():
+        if key.startswith('_') or key in skip_keys or val is None: continue
+        ctrait = model.trait( key )
+        if ctrait is None or ctrait.handler is None: continue
+        handler = ctrait.handler
+
+        if isinstance( handler, List ):
+            if not isinstance( val, (list, tuple, TraitListObject) ): continue
+            item_trait = handler.item_trait
+            rule = _batch_rule_for( item_trait.handler )
+            if rule is None: continue
+            values, bad = validate_batch( rule, val, lambda i, value: item_trait.validate( model, key, value ) )
+            if bad:
+                log( LOG_LEVEL.ERROR, "Dropping %d invalid elements of %s, at positions" % (len(bad), key), bad[:10] )
+                bad = set(bad)
+                values = [ v for i, v in enumerate(values) if i not in bad ]
+            if handler.minlen <= len( values ) <= handler.maxlen:
+                lists[key] = trait_list = TraitListObject( handler, model, key, [] )
+                list.__setitem__( trait_list, slice(None), values )
+            else:
+                validated[key] = values  #For the trait to report the length error
+        else:
+            rule = _batch_rule_for( handler )
+            if rule is not None:
+                groups.setdefault( rule, [] ).append( (key, val) )
+
+    for rule, items in groups.iteritems():
+        keys = [ key for key, _ in items ]
+        values, bad = validate_batch( rule, [ val for _, val in items ],
+                                      lambda i, value: model.validate_trait( keys[i], value ) )
+        bad = set(bad)
+        validated.update( (keys[i], v) for i, v in enumerate(values) if i not in bad )
+
+    return validated, lists
+
+
+
+################################################################################################
+##  FUNCTIONS FOR LOOKUP AND DYNAMIC OBJECTS CREATION - Core generic trait logic 
+################################################################################################ 
+
+#==================================================================================================
+def create_list_trait( obj ):
+    """ Creates a Trait for a list-type object.
         In case the list has objects all of the same class type, a ListClassModel Instance interface is presented to the user.
         If all the objects are python primary types, a Inline editor is presented
         Otherwise (mixed) it is transformed into an object editor, disallowing deletion and addition of new objects.
     """
 #--------------------------------------------------------------------------------------------------
     #Object is iterable, so we can create a list editing obj
-    types = tuple(set( map(_type_func, iter(obj) ) ))
+    #The types of all the elements are checked, which is cheap. Only the fields of models are
+    #inferred from a sample, unless the list is small (see set_inference)
+    types = tuple(set( map(_type_func, obj) ))
+    samples = _sample_for_inference( obj )
     
     t_count = len(types)
     
@@ -638,20 +1812,13 @@ def create_list_trait( obj ):
             t_inter = List( t, editor = ListStrEditor( editable=True, auto_add=True ) )
         
         else:
-            model = get_obj_t(t)
-            
+            model = _model_for_elements( t, samples )
             if model is None:
-                if hasattr( obj[0], "__dict__" ):
-                    log( LOG_LEVEL.DEBUG, " ... of unknown type", t.__name__ )
-                    model = get_or_create_ModelClass_for_obj( obj[0] )
-                else:
-                    #We are facing a type without __dict__, -> no way to recreate objects
-                    log( LOG_LEVEL.DEBUG, " Converting list to Generic due to inner type:", t.__name__ )
-                    t_obj = GenericTrait(obj, as_list = True)
-                    t_inter = Instance(GenericTrait)
-                    return t_inter, t_obj
-            else:
-                log( LOG_LEVEL.DEBUG, " ... of existing Model", model.__name__ )
+                #We are facing a type without __dict__, -> no way to recreate objects
+                log( LOG_LEVEL.DEBUG, " Converting list to Generic due to inner type:", t.__name__ )
+                t_obj = GenericTrait(obj, as_list = True)
+                t_inter = Instance(GenericTrait)
+                return t_inter, t_obj
             
             #ListClasses now need an orig_class, so that new objects can be transformed into original objects
             listClass = _get_or_create_ClassListOf( model, _type_func(obj[0]) )
@@ -660,14 +1827,45 @@ def create_list_trait( obj ):
             t_obj = listClass( obj )
             t_inter = Instance(ListClassModel)
     else:
-         #Oh my... mixed array
-         # -> create an object with the mixes? names?
-         t_obj = GenericTrait(obj, as_list = True)
-         t_inter = Instance(GenericTrait)
+        if all( t not in _registered_base_types for t in types ) and \
+           all( hasattr(elem, "__dict__") for elem in samples ):
+            #Objects of a few types, each type converted at once with its model
+            log( LOG_LEVEL.DEBUG, " ... of types", ", ".join( t.__name__ for t in types ) )
+            try:
+                return Instance(UnionListClassModel), UnionListClassModel( obj )
+            except TraitError as e:
+                #Some type, not in the samples, cant be converted
+                log( LOG_LEVEL.DEBUG, " Converting list to Generic:", str(e) )
+        #Oh my... mixed array
+        # -> create an object with the mixes? names?
+        t_obj = GenericTrait(obj, as_list = True)
+        t_inter = Instance(GenericTrait)
 
     return t_inter, t_obj
 
 
+#==================================================================================================
+def _model_for_elements( t, samples ):
+    """Returns the model for list elements of type t (not a base type), inferring or extending a
+    dynamic model with the samples. None if the elements cant be converted (they have no __dict__)"""
+#--------------------------------------------------------------------------------------------------
+    if issubclass( t, HasTraits ):
+        return t
+    model = get_obj_t(t)
+    if model is not None and t.__name__ not in _api_types_to_trait:
+        #Dynamic model, which might have to be extended with fields seen in these samples
+        model = get_or_create_ModelClass_for_obj( samples[0], samples )
+
+    if model is None:
+        if not hasattr( samples[0], "__dict__" ):
+            return None
+        log( LOG_LEVEL.DEBUG, " ... of unknown type", t.__name__ )
+        model = get_or_create_ModelClass_for_obj( samples[0], samples )
+    else:
+        log( LOG_LEVEL.DEBUG, " ... of existing Model", model.__name__ )
+    return model
+
+
 
 #==================================================================================================
 def create_generic_trait( obj ):
@@ -688,7 +1886,14 @@ def create_generic_trait( obj ):
             obj_props = vars(obj)
         except TypeError:
             #The most generic way
-            trait_obj = GenericTrait(obj)
+            obj_props = None
+
+        if obj_props is None or len(obj_props) > _wide.threshold:
+            if len(obj_props or obj) > _wide.threshold:
+                log( LOG_LEVEL.INFO, "Wide object, fields are paged" )
+                trait_obj = WideGenericTrait(obj)
+            else:
+                trait_obj = GenericTrait(obj)
             t_inter = Instance(GenericTrait, ())
         else:
             newModel = get_or_create_ModelClass_for_obj( obj )
@@ -710,19 +1915,19 @@ def get_or_create_trait_for( obj ):
         return Instance(obj, ()), obj
     
     _logging.depth +=1
-
-    #Lookup handling class
-    trait_t = get_obj_t( _type_func(obj) )
-    log( LOG_LEVEL.MORE_INFO, "Found trait_t", trait_t )
-    
-    if trait_t is not None:
-        log( LOG_LEVEL.INFO, "Type", _type_func(obj), "Converted to", trait_t )
-        trait_obj = trait_t( obj )
-        t_inter = Instance(trait_t, ())
-    else:
-        t_inter, trait_obj = create_generic_trait( obj )
-
-    _logging.depth -=1
+    try:
+        #Lookup handling class
+        trait_t = get_obj_t( _type_func(obj) )
+        log( LOG_LEVEL.MORE_INFO, "Found trait_t", trait_t )
+        
+        if trait_t is not None:
+            log( LOG_LEVEL.INFO, "Type", _type_func(obj), "Converted to", trait_t )
+            trait_obj = trait_t( obj )
+            t_inter = Instance(trait_t, ())
+        else:
+            t_inter, trait_obj = create_generic_trait( obj )
+    finally:
+        _logging.depth -=1
     return t_inter, trait_obj
 
 
@@ -742,9 +1947,10 @@ def get_or_create_editor_for_obj( obj ):
 
 
 #==================================================================================================
-def edit( obj, replace=True ):
+def edit( obj, replace=True, compact=False ):
     """Magic function allowing editing of any object.
     It turns the object into a complex trait object, by introspection, and displays a Gui for editting.
+    Unless replacing the object, the result is returned, as records with compact=True (see get_object)
     """
 #--------------------------------------------------------------------------------------------------
     trait_ed = get_or_create_editor_for_obj( obj )
@@ -758,7 +1964,7 @@ def edit( obj, replace=True ):
             obj.update( trait_ed.get_object(True) )
         return obj
 
-    return trait_ed.get_object()
+    return trait_ed.get_object( compact=compact )
     
 
 
@@ -768,11 +1974,563 @@ def edit( obj, replace=True ):
 def register_api_type_handler( **types ):
     "Handles the api types specified as argument names with the argument value Handler"
 #--------------------------------------------------------------------------------------------------
-    _api_types_to_trait.update(types)
+    global _api_types_to_trait
+    #Replaced, not updated, so that lookups in other threads always see a consistent registry
+    with _classes_lock:
+        api_types = dict( _api_types_to_trait )
+        api_types.update( types )
+        _api_types_to_trait = api_types
+
+
+#==================================================================================================
+def set_inference( strategy=None, sample_size=None, budget=None ):
+    """Configures how models are inferred from lists of objects.
+    strategy: 'first'     -> only the first element is inspected (as in gForms 1.0)
+              'first_k'   -> the first sample_size elements (default)
+              'reservoir' -> sample_size elements randomly picked over the list
+              'full'      -> all the elements
+    Lists not bigger than sample_size are always fully inspected, so that their model is exact.
+    budget limits the number of fields merged, so that very wide objects dont blow the cost."""
+#--------------------------------------------------------------------------------------------------
+    if strategy is not None:
+        if strategy not in ('first', 'first_k', 'reservoir', 'full'):
+            raise ValueError( "Unknown inference strategy %s" % strategy )
+        _inference.strategy = strategy
+    if sample_size is not None:
+        _inference.sample_size = max( 1, sample_size )
+    if budget is not None:
+        _inference.budget = budget
+
+
+
+#==================================================================================================
+def warm_up( types_or_models=(), workers=2 ):
+    """Prebuilds in background threads, e.g. at application startup, what the first form of a type
+    otherwise builds while the user waits: dynamic model and list classes, trait editors and default
+    views. Covers all the models registered with register_api_type_handler, plus the given model
+    classes and sample objects (or lists of samples, converted as the lists would be).
+    Returns a WarmUp handle, whose wait() returns the seconds taken per item"""
+#--------------------------------------------------------------------------------------------------
+    items = list( types_or_models )
+    items += [ model for model in _api_types_to_trait.values()
+               if isinstance(model, type) and issubclass(model, HasTraits) and model not in items ]
+    return WarmUp( items, workers )
+
+
+#==================================================================================================
+#--------------------------------------------------------------------------------------------------
+class WarmUp( object ):
+    """ Handle of a background warm up (see warm_up()). As items complete, their time in seconds is
+        added to timings, or their exception to errors, keyed by the item: the model class or the
+        sample, or its id() if it is not hashable (lists and dicts of samples)
+    """
+#--------------------------------------------------------------------------------------------------
+    def __init__( self, items, workers ):
+        self.timings = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        for item in items:
+            self._queue.put( item )
+        self._threads = [ threading.Thread( target=self._work, name="gforms-warm-up-%d" % i )
+                          for i in range( max(1, min(workers, len(items))) ) ]
+        for thread in self._threads:
+            thread.daemon = True  #Never holds the application exit
+            thread.start()
+    
+    
+    #--------------------------------------------------------------------------------------------------
+    def wait( self, timeout=None ):
+        """Waits for the warm up to finish, or the timeout (seconds). Returns the timings"""
+    #--------------------------------------------------------------------------------------------------
+        deadline = None if timeout is None else time.time() + timeout
+        for thread in self._threads:
+            thread.join( None if deadline is None else max( 0, deadline - time.time() ) )
+        with self._lock:
+            return dict( self.timings )  #Workers may still be adding to it
+    
+    def done( self ):
+        return not any( thread.is_alive() for thread in self._threads )
+    
+    
+    #--------------------------------------------------------------------------------------------------
+    def _work( self ):
+    #--------------------------------------------------------------------------------------------------
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if isinstance( item, type ):
+                name = item.__name__
+            else:
+                name = _type_func( item[0] if _is_list(item) and len(item) else item ).__name__
+            key = item
+            try:
+                hash( key )
+            except TypeError:
+                key = id( item )  #Lists and dicts of samples
+            start = time.time()
+            try:
+                _warm_up_type( item )
+            except Exception as e:
+                log( LOG_LEVEL.WARN, "Warm up of", name, "failed:", str(e) )
+                with self._lock:
+                    self.errors[key] = e
+            else:
+                elapsed = time.time() - start
+                with self._lock:
+                    self.timings[key] = elapsed
+                log( LOG_LEVEL.INFO, "Warmed up", name, "in %.3f s" % elapsed )
+
+
+def _warm_up_type( item ):
+    if isinstance( item, type ):
+        classes = set([ item ])
+    else:
+        #Samples are converted as the elements of a list, creating their dynamic model, list class
+        #and the models of their sub objects
+        list_model = get_or_create_editor_for_obj( item if _is_list(item) else [item] )
+        if not isinstance( list_model, HasTraits ):
+            return  #Base values, nothing to build
+        classes = set( node.__class__ for node in _iter_model_tree( list_model ) )
+    #Along with the models they refer to (fields and list elements)
+    pending, done = list( classes ), set()
+    while pending:
+        cls = pending.pop()
+        if cls in done: continue
+        done.add( cls )
+        class_traits = cls.class_traits()
+        for name in cls.class_visible_traits():
+            class_traits[name].get_editor()
+        if issubclass( cls, (ClassModel, GenericTrait) ) and not cls.class_trait_view_elements().filter_by():
+            _cached_view( sorted( cls.class_visible_traits() ), class_traits.get )
+        else:
+            cls.class_trait_view()
+        referred = [ getattr( ctrait.handler, 'klass', None ) for ctrait in class_traits.values() ]
+        if '_inner_type' in class_traits:
+            referred.append( class_traits['_inner_type'].default )
+        pending.extend( klass for klass in referred if isinstance(klass, type) and
+                        issubclass(klass, HasTraits) and klass is not HasTraits )
+
+
+
+
+################################################################################################
+##  SCHEMA IMPORT - Ahead of time compilation of models from declarative schemas
+################################################################################################
+
+#==================================================================================================
+# Schema type names to trait types. Type names which are not here must refer to other definitions
+#==================================================================================================
+_schema_base_types = {
+    'string'   : CStr,
+    'str'      : CStr,
+    'integer'  : Int,
+    'int'      : Int,
+    'long'     : Long,
+    'number'   : Float,
+    'float'    : Float,
+    'double'   : Float,
+    'complex'  : Complex,
+    'boolean'  : Bool,
+    'bool'     : Bool,
+    'date'     : Date,
+    'time'     : Time,
+    'datetime' : Any,
+    'date-time': Any,
+    'password' : Password,
+    'any'      : Any
+}
+
+# Bump whenever the descriptors layout changes, so that old cache files are not picked up
+_SCHEMA_DESCRIPTOR_VERSION = 2
+
+_schema_options = _O()
+_schema_options.cache_dir = os.path.join( tempfile.gettempdir(), "gforms_schemas" )
+
+# Compiled schemas in the current process, by content hash -> {name: class}
+_compiled_schemas = {}
+
+
+#==================================================================================================
+def load_schema( schema, cache_dir=None, register=True ):
+    """Builds ClassModel / ListClassModel classes from a declarative (JSON-Schema / WSDL like) schema.
+
+    The schema can be a dictionary, a JSON string, a file name or a file object, and either maps
+    type names to their definitions or keeps them under a "definitions" key. e.g.:
+    {
+      "User":     { "type": "object",
+                    "properties": { "name": {"type": "string"}, "number": "integer" },
+                    "templates":  { "user1": {"name": "F1", "number": 1} } },
+      "UserList": { "type": "array", "items": {"$ref": "#/definitions/User"} },
+      "System":   { "properties": { "users": {"$ref": "UserList"}, "location": "string",
+                                    "admin": "User", "tags": ["string"] } }
+    }
+    The schema is compiled into plain descriptors, which are cached on disk by content hash
+    (cache_dir=False disables it). Unless register=False the new models are registered as
+    api type handlers, so that objects with the same class names are converted with them.
+    Returns a dictionary of model names to the generated classes.
+    """
+#--------------------------------------------------------------------------------------------------
+    schema = _read_schema( schema )
+    key = _schema_hash( schema )
+
+    classes = _compiled_schemas.get( key )
+    if classes is None:
+        with _classes_lock:
+            #Only one set of classes per schema, even if loaded concurrently
+            classes = _compiled_schemas.get( key ) or _load_schema_classes( key, schema, cache_dir )
+
+    if register:
+        register_api_type_handler( **classes )
+    return classes
+
+
+#==================================================================================================
+def _load_schema_classes( key, schema, cache_dir ):
+    """Builds the classes of a schema, from the cached descriptors if available"""
+#--------------------------------------------------------------------------------------------------
+    if cache_dir is None:
+        cache_dir = _schema_options.cache_dir
+    descriptors = _load_cached_descriptors( cache_dir, key ) if cache_dir else None
+    if descriptors is None:
+        descriptors = compile_schema( schema )
+        if cache_dir:
+            _store_cached_descriptors( cache_dir, key, descriptors )
+    else:
+        log( LOG_LEVEL.DEBUG, "Using cached schema descriptors", key )
+    classes = _compiled_schemas[key] = build_schema_classes( descriptors )
+    return classes
+
+
+#==================================================================================================
+def compile_schema( schema ):
+    """Resolves a schema into a list of model descriptors (JSON serializable). References are
+    resolved and inline objects/arrays turned into their own named descriptors, so that the
+    classes can be built straight away"""
+#--------------------------------------------------------------------------------------------------
+    schema = _read_schema( schema )
+    definitions = schema.get( 'definitions', schema )
+    descriptors = []
+    names = set( definitions.keys() )
+    described = set()
+
+    def field_spec( owner, name, definition ):
+        # Shorthands: "integer", "User", ["User"]
+        if isinstance( definition, basestring ):
+            definition = {'type': definition}
+        elif isinstance( definition, list ):
+            definition = {'type': 'array', 'items': definition[0] if definition else 'any'}
+
+        if '$ref' in definition:
+            ref = definition['$ref'].split('/')[-1]
+            if ref not in names:
+                raise FormsException( "%s.%s refers to unknown type %s" % (owner, name, ref) )
+            return ['ref', ref]
+        if 'enum' in definition:
+            return ['enum', list( definition['enum'] )]
+
+        t = definition.get( 'type', 'object' )
+        t = definition.get( 'format', t ) if t == 'string' else t
+        if t in _schema_base_types:
+            return ['base', t]
+        if t in names:
+            return ['ref', t]
+        if t == 'array':
+            # Lists of models get their own list class, inline item models are named after it
+            list_name = "%s_%s" % (owner, name)
+            items = field_spec( list_name, 'item', definition.get('items', 'any') )
+            if items[0] in ('base', 'enum'):
+                return ['base_list', items[1] if items[0] == 'base' else 'string']
+            add_list( list_name, items )
+            return ['ref', list_name]
+        if t == 'object':
+            model_name = "%s_%s" % (owner, name)
+            add_descriptor( model_name, definition )
+            return ['ref', model_name]
+        raise FormsException( "Unknown type '%s' for field %s.%s" % (t, owner, name) )
+
+    def add_name( name ):
+        if name in described:
+            raise FormsException( "Duplicate model name %s" % name )
+        described.add( name )
+        names.add( name )
+
+    def add_list( name, inner ):
+        if inner[0] != 'ref':
+            raise FormsException( "List type %s must hold models, not %s" % (name, inner[1]) )
+        add_name( name )
+        descriptors.append( {'name': name, 'kind': 'list', 'inner': inner[1]} )
+
+    def add_descriptor( name, definition ):
+        if isinstance( definition, (basestring, list) ):
+            definition = {'type': definition} if isinstance( definition, basestring ) \
+                         else {'type': 'array', 'items': definition[0]}
+
+        if definition.get( 'type', 'object' ) == 'array':
+            names.add( name )  #Items might refer to the list itself
+            add_list( name, field_spec( name, 'item', definition.get('items', 'any') ) )
+        else:
+            add_name( name )
+            props = definition.get( 'properties', {} )
+            fields = []
+            for field_name in sorted( props ):
+                field_def = props[field_name]
+                spec = field_spec( name, field_name, field_def )
+                if isinstance( field_def, dict ) and 'default' in field_def:
+                    spec.append( field_def['default'] )
+                fields.append( [field_name] + spec )
+            descriptors.append( {'name': name, 'kind': 'model', 'fields': fields,
+                                 'templates': definition.get( 'templates', {} ) } )
+
+    for name in sorted( definitions ):
+        add_descriptor( name, definitions[name] )
+
+    return {'version': _SCHEMA_DESCRIPTOR_VERSION, 'models': descriptors }
+
+
+#==================================================================================================
+def build_schema_classes( descriptors ):
+    """Creates the model classes from the compiled descriptors. Models are created first with all
+    their base fields at once, then the list classes, and finally the links between models, which
+    allows for recursive definitions"""
+#--------------------------------------------------------------------------------------------------
+    classes = {}
+    links = []
+
+    for desc in descriptors['models']:
+        if desc['kind'] != 'model': continue
+        class_dict = { '_templates': desc['templates'] }
+        for field in desc['fields']:
+            name, kind, arg = field[:3]
+            name = str(name)  #Json gives unicode, trait names must be plain strings
+            if kind == 'ref':
+                links.append( (desc['name'], name, arg) )
+                continue
+            trait = _schema_field_trait( kind, arg, *field[3:] )
+            class_dict[name] = trait
+        classes[desc['name']] = type( str(desc['name']), (ClassModel,), class_dict )
+
+    for desc in descriptors['models']:
+        if desc['kind'] == 'list':
+            classes[desc['name']] = None  #Placeholder, inner type might be a list too
+
+    def get_list_class( name ):
+        if classes[name] is None:
+            inner = next( d['inner'] for d in descriptors['models'] if d['name'] == name )
+            if classes[inner] is None:
+                get_list_class( inner )
+            #The original class is taken from the source elements, when converting them
+            classes[name] = type( str(name), (ListClassModel,), dict( _inner_type=classes[inner] ) )
+        return classes[name]
+
+    for desc in descriptors['models']:
+        if desc['kind'] == 'list':
+            get_list_class( desc['name'] )
+
+    for owner, name, target in links:
+        classes[owner].add_class_trait( name, ModelInstance( classes[target] ) )
+
+    log( LOG_LEVEL.DEBUG, "Built %d classes from schema" % len(classes) )
+    return classes
+
+
+def _schema_field_trait( kind, arg, *default ):
+    if kind == 'enum':
+        return Enum( *arg ) if not default else Enum( default[0], arg )
+    trait_t = _schema_base_types[arg]
+    if kind == 'base_list':
+        return ListOfStr if trait_t is CStr else List( trait_t, editor=ListStrEditor( editable=True, auto_add=True ) )
+    return trait_t( *default )
+
+
+def _read_schema( schema ):
+    if isinstance( schema, dict ):
+        return schema
+    if hasattr( schema, 'read' ):
+        return json.load( schema )
+    if os.path.isfile( schema ):
+        with open( schema ) as f:
+            return json.load( f )
+    return json.loads( schema )
+
+
+def _schema_hash( schema ):
+    text = json.dumps( schema, sort_keys=True, separators=(',', ':') )
+    return hashlib.sha1( ("%d:" % _SCHEMA_DESCRIPTOR_VERSION) + text ).hexdigest()
+
+
+def _load_cached_descriptors( cache_dir, key ):
+    try:
+        with open( os.path.join(cache_dir, key + ".json") ) as f:
+            descriptors = json.load( f )
+    except (IOError, OSError, ValueError):
+        return None
+    if descriptors.get( 'version' ) != _SCHEMA_DESCRIPTOR_VERSION:
+        return None
+    return descriptors
+
+
+def _store_cached_descriptors( cache_dir, key, descriptors ):
+    try:
+        if not os.path.isdir( cache_dir ):
+            os.makedirs( cache_dir )
+        # Write to a temp file and move it, so that concurrent processes never read half a file
+        fd, tmp_name = tempfile.mkstemp( dir=cache_dir )
+        with os.fdopen( fd, 'w' ) as f:
+            json.dump( descriptors, f )
+        os.rename( tmp_name, os.path.join(cache_dir, key + ".json") )
+    except (IOError, OSError) as e:
+        log( LOG_LEVEL.WARN, "Could not cache schema descriptors in", cache_dir, "Error:", str(e) )
 
 
 
 
+################################################################################################
+##  STREAMING EXPORT - Writing edited models out without building the output objects
+################################################################################################
+
+#==================================================================================================
+def iter_events( model ):
+    """Walks a model tree (ClassModel, GenericTrait, ListClassModel or plain values) depth first,
+    yielding (path, value) for every base value, in the path syntax of ClassModel.get_path(), e.g.
+    ("users[0].name", "F1"). Empty lists and objects are yielded as [] and {}.
+    Only the current branch is held in memory"""
+#--------------------------------------------------------------------------------------------------
+    items = _export_items( model )
+    if items is None:
+        yield "", model
+        return
+    stack = [ [items[0], items[1], "", 0] ]   #is_array, children, path, count
+    while stack:
+        frame = stack[-1]
+        is_array, children, prefix = frame[0], frame[1], frame[2]
+        for key, child in children:
+            frame[3] += 1
+            if is_array:
+                path = "%s[%d]" % (prefix, key)
+            else:
+                path = "%s.%s" % (prefix, key) if prefix else str(key)
+            items = _export_items( child )
+            if items is None:
+                yield path, child
+            else:
+                stack.append( [items[0], items[1], path, 0] )
+                break
+        else:
+            stack.pop()
+            if frame[3] == 0 and stack:
+                yield prefix, ([] if is_array else {})
+
+
+#==================================================================================================
+def write_json( model, fp ):
+    """Writes a model tree as JSON to a file-like object, as it is walked (see iter_events()).
+    Dates and times are written in ISO format"""
+#--------------------------------------------------------------------------------------------------
+    encode = _json_encoder.encode
+    out = []
+    write = out.append
+    items = _export_items( model )
+    if items is None:
+        fp.write( encode(model) )
+        return
+    write( '[' if items[0] else '{' )
+    stack = [ [items[0], items[1], False] ]   #is_array, children, separator needed
+    while stack:
+        frame = stack[-1]
+        is_array, children = frame[0], frame[1]
+        for key, child in children:
+            if frame[2]:
+                write( ',' )
+            frame[2] = True
+            if not is_array:
+                write( encode( key if isinstance(key, basestring) else str(key) ) )
+                write( ':' )
+            items = _export_items( child )
+            if items is None:
+                write( encode(child) )
+            else:
+                write( '[' if items[0] else '{' )
+                stack.append( [items[0], items[1], False] )
+                break
+        else:
+            stack.pop()
+            write( ']' if is_array else '}' )
+        if len( out ) > 4096:
+            fp.write( "".join(out) )
+            del out[:]
+    fp.write( "".join(out) )
+
+
+#==================================================================================================
+def write_csv( list_model, fp, columns=None ):
+    """Writes the elements of a list model as CSV rows, one column per base value path of the
+    elements (e.g. "address.street"). Columns are taken from the first element if not given.
+    Returns the number of rows written"""
+#--------------------------------------------------------------------------------------------------
+    items = _export_items( list_model )
+    if items is None or not items[0]:
+        raise FormsException( "Only lists can be written as CSV, not %s" % _type_func(list_model).__name__ )
+    writer = csv.writer( fp )
+    rows = 0
+    for _, elem in items[1]:
+        values = dict( iter_events( elem ) )
+        if columns is None:
+            columns = [ path for path, _ in iter_events( elem ) ]
+        if rows == 0:
+            writer.writerow( columns )
+        writer.writerow( [ _csv_value( values.get(column) ) for column in columns ] )
+        rows += 1
+    return rows
+
+
+#==================================================================================================
+def _export_items( value ):
+    """The children of a container in a model tree, as (is_array, iterator of (key, child)).
+    None for base values. Sub models are accessed as get_object() does"""
+#--------------------------------------------------------------------------------------------------
+    if isinstance( value, HasTraits ):
+        if isinstance( value, ListClassModel ):
+            return True, enumerate( value._matrix )
+        if isinstance( value, WideGenericTrait ):
+            return False, ( (name, value._values[name]) for name in value._index )
+        names = _field_names( value )
+        if isinstance( value, GenericTrait ) and value._GenericTrait__is_list:
+            positions = sorted( int(name[3:]) for name in names )
+            return True, ( (i, getattr(value, 'pos%d' % i)) for i in positions )
+        return False, ( (name, getattr(value, name)) for name in sorted(names) )
+    if value is None or type(value) in _registered_base_types:
+        return None
+    if isinstance( value, (list, tuple) ):
+        return True, enumerate( value )
+    if isinstance( value, dict ):
+        props = value
+    else:
+        try:
+            props = vars( value )
+        except TypeError:
+            return None
+    return False, ( (key, props[key]) for key in sorted(props) if not str(key).startswith('_') )
+
+
+def _json_default( value ):
+    iso = getattr( value, 'isoformat', None )
+    return iso() if iso is not None else unicode( value )
+
+_json_encoder = json.JSONEncoder( separators=(',', ':'), default=_json_default )
+
+
+def _csv_value( value ):
+    if value is None or value == [] or value == {}:
+        return ""
+    if isinstance( value, unicode ):
+        return value.encode( 'utf-8' )
+    return value
+
+
+
 ################################################################################################
 # AUXILIARY functions, but might be publicly used
 ################################################################################################
@@ -802,6 +2560,482 @@ def _map_dic_values( f, d ):
         d[k] = f(v)
 
 
+#==================================================================================================
+def _validate_field( model, name, value ):
+    """Validates a value for a field of a model, converting objects to the field model as
+    set_init() does. Returns the value to assign, or raises TraitError"""
+#--------------------------------------------------------------------------------------------------
+    trait = model.trait( name )
+    if trait is None:
+        raise TraitError( "no such field" )
+    try:
+        trait.validate( model, name, value )
+        return value
+    except TraitError:
+        klass = getattr( trait.handler, 'klass', None )
+        if value is not None and isinstance(klass, type) and issubclass(klass, ClassModel):
+            return klass( value )
+        raise
+
+
+#==================================================================================================
+def _model_fields( node ):
+    """The editable fields of a model as (name, value), in order: the fields of a ClassModel or
+    GenericTrait (positions of list-like GenericTraits numerically), or (index, element) for a
+    ListClassModel. Sub models which were never accessed are not created"""
+#--------------------------------------------------------------------------------------------------
+    if isinstance( node, ListClassModel ):
+        return list( enumerate(node._matrix) )
+    if isinstance( node, WideGenericTrait ):
+        return sorted( node._values.iteritems() )
+
+    if isinstance( node, GenericTrait ) and node._GenericTrait__is_list:
+        names = sorted( _field_names(node), key=lambda name: int(name[3:]) )
+    else:
+        names = sorted( _field_names(node) )
+    d = node.__dict__
+    return [ (name, d[name] if name in d else node.trait(name).default) for name in names
+             if name in d or not isinstance(node.trait(name).handler, Instance) ]
+
+
+#Field names of models, by class and names of instance traits. See _field_names()
+_field_names_cache = {}
+
+#==================================================================================================
+def _field_names( node ):
+    """Names of the editable (public, non event) traits of a model, without creating them"""
+#--------------------------------------------------------------------------------------------------
+    key = ( node.__class__, frozenset(node._instance_traits()) )
+    names = _field_names_cache.get( key )
+    if names is None:
+        if len( _field_names_cache ) > 1000:  #Mostly dynamic objects of many shapes
+            _field_names_cache.clear()
+        names = _field_names_cache[key] = tuple( node.trait_names( private=is_none, type=not_event ) )
+    return names
+
+
+#Default Views, by signature of the fields. See _cached_view()
+_view_cache = {}
+
+#==================================================================================================
+def _cached_view( names, trait ):
+    """The default View for the visible fields given, trait(name) giving their traits. Views are
+    shared by all the models whose fields have the same names, trait types and editors. Adding or
+    retyping fields changes the signature, so that a View is never used for other fields"""
+#--------------------------------------------------------------------------------------------------
+    traits = [ trait(name) for name in names ]
+    signature = tuple( (name, ctrait.trait_type.__class__, ctrait.editor.__class__)
+                       for name, ctrait in zip(names, traits) )
+    view = _view_cache.get( signature )
+    if view is None:
+        if len( _view_cache ) > 1000:  #Mostly generic objects of many shapes
+            _view_cache.clear()
+        view = _view_cache[signature] = View( names, buttons=['OK', 'Cancel'] )
+    return view
+
+
+#Fingerprints of the source values, by id, during a refresh. See _FingerprintMemo
+_refresh_memo = threading.local()
+
+#==================================================================================================
+def _fingerprint( value ):
+    """A hashable digest of a source value or of a model, equal for a model and the source data it
+    holds. Only model fields which were set count. Empty values (None, '', 0, empty lists and
+    models) and private fields dont, so that defaults shown in an editor still match a source
+    omitting them.
+    Fingerprints of models are cached (see _model_fingerprint()), those of source values are only
+    kept during a refresh (see _FingerprintMemo)"""
+#--------------------------------------------------------------------------------------------------
+    t = type(value)
+    if t in _base_types_to_trait:  #Most values, subclasses are found below
+        return value
+    if isinstance( value, HasTraits ):
+        return _model_fingerprint( value )[0]
+    if t in _registered_base_types:
+        return value
+    if isinstance( value, TraitListObject ):
+        return _held_fingerprint( value, None )[0]
+    memo = getattr( _refresh_memo, 'fingerprints', None )
+    if memo is not None:
+        fp = memo.get( id(value) )
+        if fp is not None:
+            return fp
+    if _is_list( value ):
+        fp = tuple( elem if type(elem) in _base_types_to_trait else _fingerprint(elem) for elem in value )
+    else:
+        try:
+            items = vars(value).iteritems()
+        except TypeError:
+            try:
+                items = value.iteritems()
+            except AttributeError:
+                return id(value)  #Unknown, only equal to itself
+        fps = []
+        for key, val in items:
+            if key.startswith('_'): continue
+            val_fp = val if type(val) in _base_types_to_trait else _fingerprint( val )
+            if val_fp:
+                fps.append( (key, val_fp) )
+        fp = frozenset( fps )
+    if memo is not None:
+        memo[id(value)] = fp  #The source is held by the caller, ids are not reused meanwhile
+    return fp
+
+
+#==================================================================================================
+def _model_fingerprint( model ):
+    """The fingerprint of a model, and whether it is stable: built only from base values, lists
+    and stable models, all notifying their changes. Stable fingerprints are cached in the model
+    until it, or a model below, changes (see _fingerprint_changed()), so unchanged sub trees cost
+    nothing. Models held by a bulk update, which dont notify meanwhile, and raw objects (like the
+    fields of a WideGenericTrait) are digested every time, as the models above them"""
+#--------------------------------------------------------------------------------------------------
+    d = model.__dict__
+    held = bool( BulkUpdate._active ) and model in BulkUpdate._active
+    if not held:
+        fp = d.get( '_fingerprint_cache' )
+        if fp is not None:
+            return fp, True
+
+    stable = not held
+    if _is_list_model( model ):
+        fps = []
+        for _, elem in _model_fields( model ):
+            elem_fp, elem_stable = _held_fingerprint( elem, model )
+            fps.append( elem_fp )
+            stable = stable and elem_stable
+        fp = tuple( fps )
+    else:
+        if isinstance( model, WideGenericTrait ):
+            items = model._values.iteritems()
+            stable = False
+        else:
+            names = _field_names( model )
+            items = [ (name, d[name]) for name in names if name in d ]
+            #Attributes without a declared trait, not kept in the names
+            names = set( names )
+            items.extend( (name, val) for name, val in d.iteritems()
+                          if name not in names and not name.startswith('_') and model.trait( name ).type == 'python' )
+        fps = []
+        for key, val in items:
+            if key.startswith('_'): continue
+            val_fp, val_stable = _held_fingerprint( val, model )
+            stable = stable and val_stable
+            if val_fp:
+                fps.append( (key, val_fp) )
+        fp = frozenset( fps )
+    stable = stable and isinstance( model, (ClassModel, GenericTrait) )  #Others are not listened to
+    if stable:
+        _fingerprint_holders( model )
+        d['_fingerprint_cache'] = fp
+    return fp, stable
+
+
+#==================================================================================================
+def _held_fingerprint( value, holder ):
+    """The fingerprint of a field value of the model holder, and whether it is stable (see
+    _model_fingerprint()). Sub models are linked to their holder, to pass their changes on"""
+#--------------------------------------------------------------------------------------------------
+    t = type(value)
+    if t in _base_types_to_trait or (not isinstance( value, HasTraits ) and t in _registered_base_types):
+        return value, True
+    if isinstance( value, HasTraits ):
+        if holder is not None and isinstance( value, (ClassModel, GenericTrait) ):
+            holders = _fingerprint_holders( value )
+            if not any( ref() is holder for ref in holders ):
+                holders.append( weakref.ref( holder ) )
+        return _model_fingerprint( value )
+    if isinstance( value, TraitListObject ):
+        fps, stable = [], True
+        for elem in value:
+            elem_fp, elem_stable = _held_fingerprint( elem, holder )
+            fps.append( elem_fp )
+            stable = stable and elem_stable
+        return tuple( fps ), stable
+    return _fingerprint( value ), False
+
+
+#==================================================================================================
+def _fingerprint_holders( model ):
+    """The (weak references to the) models holding a model, whose fingerprints depend on its one.
+    Created on first use, when the model starts being listened to"""
+#--------------------------------------------------------------------------------------------------
+    holders = model.__dict__.get( '_fingerprint_holders' )
+    if holders is None:
+        holders = model.__dict__['_fingerprint_holders'] = []
+        model.on_trait_change( _fingerprinted_model_changed )
+    return holders
+
+def _fingerprinted_model_changed( model, name, new ):
+    if name != 'bulk_updated':
+        _fingerprint_changed( model )
+
+
+#==================================================================================================
+def _fingerprint_changed( model ):
+    """Drops the cached fingerprint of a model changed, and those of the models holding it.
+    Models changed without notifying (set_init, bulk updates) are reported with it"""
+#--------------------------------------------------------------------------------------------------
+    pending = [ model ]
+    while pending:
+        d = pending.pop().__dict__
+        d.pop( '_fingerprint_cache', None )
+        holders = d.get( '_fingerprint_holders' )
+        if holders:
+            pending.extend( holder for holder in ( ref() for ref in holders ) if holder is not None )
+            del holders[:]
+
+
+#==================================================================================================
+#--------------------------------------------------------------------------------------------------
+class _FingerprintMemo( object ):
+    """ Context of a refresh, the source not changing meanwhile: the fingerprints of source values
+        are kept, so that comparing the sub models of a source with those of the model, level after
+        level, digests it only once. Nested refreshes share the outermost memo
+    """
+#--------------------------------------------------------------------------------------------------
+    def __enter__( self ):
+        self.outermost = getattr( _refresh_memo, 'fingerprints', None ) is None
+        if self.outermost:
+            _refresh_memo.fingerprints = {}
+
+    def __exit__( self, exc_type, exc_value, traceback ):
+        if self.outermost:
+            _refresh_memo.fingerprints = None
+        return False
+
+
+#==================================================================================================
+def _refresh_field( current, value ):
+    """Refreshes a field from its new source value, comparing their fingerprints first so that
+    unchanged sub trees are skipped. Unchanged sub models are only bound to their new source objects.
+    Returns False if the value has to be replaced instead"""
+#--------------------------------------------------------------------------------------------------
+    if _fingerprint( current ) == _fingerprint( value ):
+        if isinstance( current, (ClassModel, GenericTrait) ) and not _is_list_model( current ):
+            current.refresh_from( value )
+        return True
+    return _refresh_in_place( current, value )
+
+
+#==================================================================================================
+def _is_list_model( model ):
+    """Whether the model holds a list: a ListClassModel or a GenericTrait created from a list"""
+#--------------------------------------------------------------------------------------------------
+    return isinstance( model, ListClassModel ) or \
+           (isinstance( model, GenericTrait ) and model._GenericTrait__is_list)
+
+
+#==================================================================================================
+def _refresh_in_place( current, value ):
+    """Refreshes a model, or a list trait, from a source value of the same kind.
+    Returns False if the value does not fit and the current one has to be replaced instead"""
+#--------------------------------------------------------------------------------------------------
+    if value is None or type(value) in _registered_base_types:
+        return False
+    if isinstance( current, (ClassModel, GenericTrait) ):
+        if _is_list_model( current ) != bool( _is_list(value) ):
+            return False
+        current.refresh_from( value )
+        return True
+    if isinstance( current, TraitListObject ) and _is_list( value ):
+        try:
+            _sync_list( current, value, lambda elem: elem )
+        except TraitError:
+            return False
+        return True
+    return False
+
+
+#==================================================================================================
+def _sync_list( items, new, convert, refresh=None ):
+    """Updates a list of elements (models or values) in place to match the new source list.
+    Only the differing range is diffed, and only differing elements are refreshed (with refresh(),
+    by default _refresh_in_place), inserted or deleted. New elements are created with convert().
+    Returns whether the list changed"""
+#--------------------------------------------------------------------------------------------------
+    new = list( new )
+    old_keys = [ _fingerprint(elem) for elem in items ]
+    new_keys = [ _fingerprint(elem) for elem in new ]
+    if old_keys == new_keys:
+        return False
+
+    #Skip common head and tail, usually most of the list
+    lo, old_hi, new_hi = 0, len(old_keys), len(new_keys)
+    while lo < old_hi and lo < new_hi and old_keys[lo] == new_keys[lo]:
+        lo += 1
+    while old_hi > lo and new_hi > lo and old_keys[old_hi-1] == new_keys[new_hi-1]:
+        old_hi -= 1
+        new_hi -= 1
+
+    refresh = refresh or _refresh_in_place
+    matcher = difflib.SequenceMatcher( None, old_keys[lo:old_hi], new_keys[lo:new_hi], autojunk=False )
+    #From the end, so that the positions of pending operations stay valid
+    for tag, i1, i2, j1, j2 in reversed( matcher.get_opcodes() ):
+        if tag == 'equal': continue
+        i1, i2, j1, j2 = i1+lo, i2+lo, j1+lo, j2+lo
+        common = min( i2-i1, j2-j1 ) if tag == 'replace' else 0
+        for k in range( common ):
+            if not refresh( items[i1+k], new[j1+k] ):
+                items[i1+k] = convert( new[j1+k] )
+        if i2-i1 > common:
+            del items[i1+common:i2]
+        if j2-j1 > common:
+            items[i1+common:i1+common] = [ convert(elem) for elem in new[j1+common:j2] ]
+    return True
+
+
+#==================================================================================================
+def _path_index_of( model ):
+    """The path index of a root model, created on first use"""
+#--------------------------------------------------------------------------------------------------
+    index = model._path_index
+    if index is None:
+        index = model._path_index = _PathIndex( model )
+    return index
+
+
+#A field (or *), or a list position (or [*]). Fields after the first are preceded by a dot
+_path_token = re.compile( r"(^|\.)([A-Za-z_]\w*|\*)|\[(\d+|\*)\]" )
+
+#Parsed paths, by path expression
+_parsed_paths = {}
+
+#==================================================================================================
+def _parse_path( path ):
+    """Splits a path expression into a tuple of field names (str) and list positions (int).
+    Wildcards are '*' for any field and '[*]' for any position"""
+#--------------------------------------------------------------------------------------------------
+    segments = _parsed_paths.get( path )
+    if segments is not None:
+        return segments
+    segments, pos = [], 0
+    while pos < len( path ):
+        match = _path_token.match( path, pos )
+        if match is None:
+            raise FormsException( "Invalid path %r at position %d" % (path, pos) )
+        _, field, index = match.groups()
+        if field is not None:
+            segments.append( field )
+        else:
+            segments.append( '[*]' if index == '*' else int(index) )
+        pos = match.end()
+    segments = tuple( segments )
+    if len( _parsed_paths ) > 1000:
+        _parsed_paths.clear()
+    _parsed_paths[path] = segments
+    return segments
+
+
+#==================================================================================================
+def _path_string( segments ):
+    """The path expression of parsed segments"""
+#--------------------------------------------------------------------------------------------------
+    return "".join( "[%s]" % (seg if seg != '[*]' else '*') if isinstance(seg, int) or seg == '[*]'
+                    else ("." + seg if i else seg) for i, seg in enumerate(segments) )
+
+
+#==================================================================================================
+def _path_child( node, key, path ):
+    """The field (str key) or element (int key) of a model or list. Raises FormsException"""
+#--------------------------------------------------------------------------------------------------
+    try:
+        if isinstance( key, int ):
+            if isinstance( node, ListClassModel ):
+                return node._matrix[key]
+            if isinstance( node, GenericTrait ) and node._GenericTrait__is_list:
+                if node.trait( 'pos' + str(key) ) is not None:
+                    return getattr( node, 'pos' + str(key) )
+            elif isinstance( node, list ):
+                return node[key]
+        elif isinstance( node, WideGenericTrait ):
+            return node._values[key]
+        elif isinstance( node, dict ):  #Values of a WideGenericTrait not yet displayed
+            return node[key]
+        elif isinstance( node, HasTraits ) and key in _field_names( node ):
+            return getattr( node, key )
+    except (IndexError, KeyError):
+        pass
+    raise FormsException( "No such path %s" % _path_string(path) )
+
+
+#==================================================================================================
+def _path_children( node, wildcard ):
+    """[(key, value)] of the fields ('*') or elements ('[*]') of a model or list"""
+#--------------------------------------------------------------------------------------------------
+    list_like = isinstance( node, (ListClassModel, list) ) or \
+                (isinstance( node, GenericTrait ) and node._GenericTrait__is_list)
+    if (wildcard == '[*]') != list_like:
+        return []
+    if isinstance( node, list ):
+        return list( enumerate(node) )
+    if isinstance( node, GenericTrait ) and node._GenericTrait__is_list:
+        return [ (int(name[3:]), value) for name, value in _model_fields(node) ]
+    if isinstance( node, HasTraits ):
+        return _model_fields( node )
+    if isinstance( node, dict ):
+        return sorted( node.iteritems() )
+    return []
+
+
+#==================================================================================================
+def _path_validate( parent, key, value ):
+    """Validates (and converts) a value for a field or element. Returns the value to assign"""
+#--------------------------------------------------------------------------------------------------
+    if isinstance( key, int ):
+        if isinstance( parent, ListClassModel ):
+            return parent._convert( value )
+        if isinstance( parent, GenericTrait ):
+            return _validate_field( parent, 'pos' + str(key), value )
+        return parent.trait.item_trait.validate( parent.object(), parent.name, value )
+    if isinstance( parent, (WideGenericTrait, dict) ):
+        return value
+    return _validate_field( parent, key, value )
+
+
+#==================================================================================================
+def _path_assign( parent, key, value ):
+    """Sets a field or element to an already validated value"""
+#--------------------------------------------------------------------------------------------------
+    if isinstance( key, int ):
+        if isinstance( parent, ListClassModel ):
+            parent._matrix[key] = value
+        elif isinstance( parent, GenericTrait ):
+            setattr( parent, 'pos' + str(key), value )
+        else:
+            parent[key] = value
+    elif isinstance( parent, WideGenericTrait ):
+        parent._values[key] = value
+        if parent.page_fields is not None and parent.page_fields.trait( key ) is not None:
+            parent._show_page()
+    elif isinstance( parent, dict ):
+        parent[key] = value
+    else:
+        setattr( parent, key, value )
+
+
+#==================================================================================================
+def _iter_model_tree( root ):
+    """Iterates over a model and its sub models (also list elements), depth first, once each"""
+#--------------------------------------------------------------------------------------------------
+    seen = set()
+    stack = [ root ]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen: continue
+        seen.add( id(node) )
+        yield node
+
+        children = [ value for _, value in _model_fields(node) ]
+        if isinstance( node, WideGenericTrait ) and node.page_fields is not None:
+            children.append( node.page_fields )
+        for value in reversed( children ):
+            if isinstance( value, HasTraits ):
+                stack.append( value )
+            elif isinstance( value, TraitListObject ):
+                stack.extend( elem for elem in reversed(value) if isinstance(elem, HasTraits) )
+
+
 
 ################################################################################################
 # AUXILIARY functions, private
@@ -825,3 +3059,71 @@ def log( level, *message ):
     if _logging.loglevel >= level:
         print( "[%10s]"%(LOG_LEVEL.get_description(level),), "  " * _logging.depth, ">", *message, file=_logging.stream)
     
+
+
+#Marks a trait which had no value set (i.e. still at its default) in a model snapshot
+_unset = _O()
+
+#==================================================================================================
+def _snapshot_model( node ):
+    """Saves the trait values of a model, and the contents of its lists and dicts, so that it can
+    be restored by _restore_model(). Values are {name: (value, content copy or None)}"""
+#--------------------------------------------------------------------------------------------------
+    if isinstance( node, WideGenericTrait ):
+        names = [ 'Filter', 'Filter_mode', 'Page', 'Pages', 'page_fields', '_matches', '_values' ]
+    else:
+        names = _field_names( node )
+        if 'Templates' in node._instance_traits():
+            names += ( 'Templates', )  #Private, but selecting one applies the template
+    d = node.__dict__
+    state = {}
+    for name in names:
+        value = d.get( name, _unset )
+        if isinstance( value, list ):
+            state[name] = ( value, list(value) )
+        elif isinstance( value, dict ):
+            state[name] = ( value, dict(value) )
+        else:
+            state[name] = ( value, None )
+    return state
+
+
+#==================================================================================================
+def _restore_model( node, state ):
+    """Restores a model snapshot. Values are put back as they were (the same list objects, with
+    the same contents), without validating or notifying"""
+#--------------------------------------------------------------------------------------------------
+    d = node.__dict__
+    for name, (value, content) in state.iteritems():
+        if value is _unset:
+            d.pop( name, None )
+            continue
+        d[name] = value
+        if isinstance( value, list ):
+            list.__setitem__( value, slice(None), content )
+        elif isinstance( value, dict ):
+            dict.clear( value )
+            dict.update( value, content )
+
+
+#==================================================================================================
+def _model_changes( node, state ):
+    """Yields (name, old value) of the traits of a model which changed since the snapshot"""
+#--------------------------------------------------------------------------------------------------
+    d = node.__dict__
+    for name, (value, content) in state.iteritems():
+        if node.trait( name ) is None: continue  #Removed meanwhile
+        new = d.get( name, _unset )
+        if new is value:
+            if content is None or content == (list(new) if isinstance(new, list) else dict(new)):
+                continue
+            old = content
+        else:
+            #Unset traits get their default on first access, which is not a change
+            old = node.trait( name ).default if value is _unset else value
+            try:
+                if new is not _unset and not (new != old):
+                    continue
+            except Exception:
+                pass  #Not comparable, e.g. arrays
+        yield name, old
@@ -0,0 +1,560 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Headless rendering of gForms models as web forms.
+
+The same ClassModel / ListClassModel definitions used with traitsui can be
+served as HTML forms, or described as JSON form schemas, without any GUI
+toolkit. The form layout of each model class is compiled once and cached, so
+rendering and parsing a submission only walk the data.
+
+Field names in the forms are paths of the model tree, e.g.:
+  location, admin.name, users[0].number
+Lists get add/remove buttons, submitted as "__add__" / "__remove__" with the
+list (or element) path as value. Templates render as a dropdown which fills
+the fields of the sub form.
+
+e.g.:
+models = load_schema( my_schema )
+html = render_form( models['System']() )
+model, errors = parse_form( models['System'], submitted_fields )
+
+serve( models ) starts a local WSGI server, as a stand-in for a real deployment.
+"""
+from __future__ import print_function
+import re
+import json
+import datetime
+import threading
+from wsgiref.simple_server import make_server
+try:
+    from urlparse import parse_qsl
+except ImportError:
+    from urllib.parse import parse_qsl
+
+from traits.api import HasTraits, Int, Long, Float, Complex, Str, CStr, Bool, Enum, Password, List, Instance
+from traits.trait_types import Date, Time, BaseInstance
+from traits.trait_handlers import TraitCoerceType
+
+from gforms import ClassModel, ListClassModel, log, LOG_LEVEL
+
+__all__ = [ 'form_schema', 'form_schema_json', 'render_form', 'form_values', 'form_data', 'parse_form',
+            'FormsApp', 'serve' ]
+
+
+#==================================================================================================
+# Trait types to json-schema (type, format) and the converters of submitted strings
+#==================================================================================================
+def _to_bool( value ):
+    return value.lower() in ('1', 'on', 'true', 'yes')
+
+def _to_str( value ):
+    return value.encode('utf-8') if isinstance( value, unicode ) else value
+
+def _to_date( value ):
+    return datetime.datetime.strptime( value, "%Y-%m-%d" ).date()
+
+def _to_time( value ):
+    return datetime.datetime.strptime( value, "%H:%M:%S" if value.count(':') == 2 else "%H:%M" ).time()
+
+_field_types = {
+    Int      : ('integer', None,       int,     'number'),
+    Long     : ('integer', None,       long,    'number'),
+    Float    : ('number',  None,       float,   'number'),
+    Complex  : ('string',  'complex',  complex, 'text'),
+    Str      : ('string',  None,       unicode, 'text'),
+    CStr     : ('string',  None,       unicode, 'text'),
+    Password : ('string',  'password', unicode, 'password'),
+    Bool     : ('boolean', None,       _to_bool,'checkbox'),
+    Date     : ('string',  'date',     _to_date,'date'),
+    Time     : ('string',  'time',     _to_time,'time'),
+}
+# Python types, as used in List(str)
+_python_types = { str: CStr, unicode: CStr, int: Int, long: Long, float: Float, complex: Complex, bool: Bool }
+
+
+#==================================================================================================
+class _FormSpec(object):
+    """The compiled form layout of a model class: its json schema, and per field the kind, the
+    converter of submitted values and the target class for nested models and lists"""
+#--------------------------------------------------------------------------------------------------
+    def __init__(self, cls):
+        self.cls = cls
+        self.is_list = issubclass( cls, ListClassModel )
+        self.fields = []      #(name, kind, info), kind in: base, enum, base_list, model, list, any
+        self.templates = {}
+        self.inner = None
+
+        if self.is_list:
+            inner = _class_default( cls, '_inner_type' )
+            if isinstance( inner, type ) and issubclass( inner, ClassModel ):
+                self.inner = inner
+                self.schema = { 'type': 'array', 'items': _ref( inner ) }
+            else:
+                #Bare ListClassModel fields of dynamic models and unions: the elements are typed per instance
+                self.schema = { 'type': 'array', 'items': {} }
+            return
+
+        self.templates = _class_default( cls, '_templates' ) or {}
+        properties = {}
+        for name in sorted( cls.class_visible_traits() ):
+            ctrait = cls.__class_traits__.get( name )
+            if name.startswith('_') or ctrait is None or ctrait.private: continue
+            kind, info, prop = _field_spec( ctrait )
+            self.fields.append( (name, kind, info) )
+            properties[name] = prop
+
+        self.renderers = dict( (name, _field_renderer(name, kind, info))
+                               for name, kind, info in self.fields if kind not in ('model', 'list', 'any') )
+        self.schema = { 'type': 'object', 'title': cls.__name__, 'properties': properties,
+                        'order': [ f[0] for f in self.fields ] }
+        if self.templates:
+            self.schema['templates'] = self.templates
+            options = u"".join( u'<option>%s</option>' % _escape(unicode(name)) for name in sorted(self.templates) )
+            self.templates_html = u'<label>Templates <select onchange="gformsTemplate(this)" data-prefix="%%s" ' \
+                                  u'data-templates="%s"><option></option>%s</select></label>' \
+                                  % ( _escape(json.dumps(self.templates, default=unicode)), options )
+
+
+def _class_default( cls, name ):
+    "Default value of a class trait, taking into account subclasses overriding it"
+    ctrait = cls.__class_traits__.get( name )
+    return ctrait.default_value()[1] if ctrait is not None else None
+
+def _ref( cls ):
+    return { '$ref': '#/definitions/' + cls.__name__ }
+
+def _handler_type( handler ):
+    t = type(handler)
+    if t is BaseInstance:
+        #Date and Time are instances, not classes
+        return { datetime.date: Date, datetime.time: Time }.get( handler.klass, t )
+    return t
+
+def _field_spec( ctrait ):
+    handler = ctrait.handler
+    t = _handler_type( handler )
+    if t in _field_types:
+        json_t, json_format, convert, input_t = _field_types[t]
+        prop = { 'type': json_t }
+        if json_format:
+            prop['format'] = json_format
+        return 'base', (convert, input_t), prop
+    if t is Enum or isinstance( handler, Enum ):
+        values = list( handler.values )
+        return 'enum', dict( (unicode(v), v) for v in values ), { 'enum': values }
+    if isinstance( handler, List ):
+        item = handler.item_trait.handler
+        item_t = _python_types.get( item.aType ) if type(item) is TraitCoerceType else _handler_type(item)
+        if item_t in _field_types:
+            json_t, json_format, convert, _ = _field_types[item_t]
+            if type(item) is TraitCoerceType:
+                #Only accepts the exact python type
+                convert = _to_str if item.aType is str else item.aType
+            return 'base_list', convert, { 'type': 'array', 'items': { 'type': json_t } }
+    if isinstance( handler, Instance ) and isinstance( handler.klass, type ):
+        if issubclass( handler.klass, ListClassModel ):
+            return 'list', handler.klass, _ref( handler.klass )
+        if issubclass( handler.klass, ClassModel ):
+            return 'model', handler.klass, _ref( handler.klass )
+    return 'any', None, { }
+
+
+#==================================================================================================
+# Compiled form specs, per model class
+#--------------------------------------------------------------------------------------------------
+_form_specs = {}
+_form_specs_lock = threading.Lock()
+
+def _get_spec( cls ):
+    spec = _form_specs.get( cls )
+    if spec is None:
+        with _form_specs_lock:
+            spec = _form_specs.get( cls )
+            if spec is None:
+                log( LOG_LEVEL.DEBUG, "Compiling form of", cls.__name__ )
+                spec = _form_specs[cls] = _FormSpec( cls )
+    return spec
+
+
+#==================================================================================================
+def form_schema( cls ):
+    """Returns the JSON form schema of a model class, with the definitions of all the nested
+    models and lists. Generated once per class."""
+#--------------------------------------------------------------------------------------------------
+    spec = _get_spec( cls )
+    schema = getattr( spec, 'full_schema', None )
+    if schema is None:
+        definitions = {}
+        pending = [cls]
+        while pending:
+            klass = pending.pop()
+            if klass.__name__ in definitions: continue
+            sub_spec = _get_spec( klass )
+            definitions[klass.__name__] = sub_spec.schema
+            if sub_spec.inner is not None:
+                pending.append( sub_spec.inner )
+            pending.extend( info for _, kind, info in sub_spec.fields if kind in ('model', 'list') )
+        schema = spec.full_schema = dict( _ref(cls), definitions=definitions )
+    return schema
+
+
+def form_schema_json( cls ):
+    "The form schema of a model class, already serialized"
+    spec = _get_spec( cls )
+    text = getattr( spec, 'schema_json', None )
+    if text is None:
+        text = spec.schema_json = json.dumps( form_schema(cls), default=unicode, sort_keys=True )
+    return text
+
+
+
+################################################################################################
+##  HTML RENDERING
+################################################################################################
+
+_TEMPLATES_SCRIPT = """<script>
+function gformsTemplate(sel) {
+  var values = JSON.parse(sel.getAttribute('data-templates'))[sel.value] || {};
+  for (var name in values) {
+    var field = sel.form.elements[sel.getAttribute('data-prefix') + name];
+    if (!field) continue;
+    if (field.type == 'checkbox') field.checked = !!values[name]; else field.value = values[name];
+  }
+}
+</script>"""
+
+#==================================================================================================
+def render_form( model, action="", title=None ):
+    """Renders a model (ClassModel or ListClassModel instance, or class for an empty form) as an
+    HTML form. Nested models become fieldsets and lists get add/remove buttons."""
+#--------------------------------------------------------------------------------------------------
+    if isinstance( model, type ):
+        model = model()
+    out = [ u'<form method="post" action="%s" class="gforms">' % _escape(action),
+            u'<h2>%s</h2>' % _escape( title or model.__class__.__name__ ) ]
+    _render_model( model, "", out, (model.__class__,) )
+    out.append( '<button type="submit" name="__submit__" value="1">OK</button></form>' )
+    out.append( _TEMPLATES_SCRIPT )
+    return u"\n".join( out )
+
+
+def _render_model( model, prefix, out, ancestors ):
+    spec = _get_spec( model.__class__ )
+    if spec.is_list:
+        return _render_list( model, spec, prefix, out, ancestors )
+
+    if spec.templates:
+        out.append( spec.templates_html % _escape(prefix) )
+
+    for name, kind, info in spec.fields:
+        path = prefix + name
+        if kind in ('model', 'list'):
+            value = None if _is_unset_recursion( model, name, kind, info, ancestors ) else getattr( model, name )
+            if value is None:
+                continue
+            out.append( u'<fieldset><legend>%s</legend>' % _escape(name) )
+            _render_model( value, path + ("." if kind == 'model' else ""), out, ancestors + (info,) )
+            out.append( u'</fieldset>' )
+        elif kind != 'any':
+            out.append( spec.renderers[name]( path, getattr(model, name) ) )
+
+
+def _is_unset_recursion( model, name, kind, info, ancestors ):
+    "Recursive models (e.g. Node.parent) are only followed when the value was set"
+    return kind == 'model' and info in ancestors and name not in model.__dict__
+
+
+def _render_list( model, spec, prefix, out, ancestors ):
+    for i, elem in enumerate( model._matrix ):
+        elem_path = "%s[%d]" % (prefix, i)
+        out.append( u'<fieldset class="gforms-item"><legend>%d</legend>' % i )
+        _render_model( elem, elem_path + ".", out, ancestors + (elem.__class__,) )
+        out.append( u'<button type="submit" name="__remove__" value="%s">Remove</button></fieldset>' % _escape(elem_path) )
+    out.append( u'<button type="submit" name="__add__" value="%s">Add</button>' % _escape(prefix) )
+
+
+def _escape( text ):
+    "Escapes text for html content and double quoted attributes"
+    return text.replace( u"&", u"&amp;" ).replace( u"<", u"&lt;" ).replace( u">", u"&gt;" ).replace( u'"', u"&quot;" )
+
+
+def _field_renderer( name, kind, info ):
+    """Compiles the html of a field, returning a function of (path, value) to render it"""
+    label = _escape( name )
+    if kind == 'enum':
+        options = [ (v, u'<option%%s>%s</option>' % _escape(text)) for text, v in sorted(info.items()) ]
+        html = u'<label>%s <select name="%%s">%%s</select></label>' % label
+        return lambda path, value: html % ( _escape(path),
+                    u"".join( option % (u' selected' if v == value else u'') for v, option in options ) )
+    if kind == 'base_list':
+        html = u'<label>%s <textarea name="%%s">%%s</textarea></label>' % label
+        return lambda path, value: html % ( _escape(path), _escape(u"\n".join( unicode(v) for v in value )) )
+
+    convert, input_t = info
+    if input_t == 'checkbox':
+        html = u'<label>%s <input type="checkbox" name="%%s" value="1"%%s></label>' % label
+        return lambda path, value: html % ( _escape(path), u' checked' if value else u'' )
+    html = u'<label>%s <input type="%s" name="%%s" value="%%s"></label>' % (label, input_t)
+    if input_t in ('date', 'time'):
+        return lambda path, value: html % ( _escape(path), u"" if value is None else value.isoformat() )
+    return lambda path, value: html % ( _escape(path), u"" if value is None else _escape(unicode(value)) )
+
+
+#==================================================================================================
+def form_values( model, prefix="", _ancestors=() ):
+    """Returns the flat dict of field paths to values (as strings) that the form of model submits"""
+#--------------------------------------------------------------------------------------------------
+    values = {}
+    spec = _get_spec( model.__class__ )
+    ancestors = _ancestors + (model.__class__,)
+    if spec.is_list:
+        for i, elem in enumerate( model._matrix ):
+            values.update( form_values(elem, "%s[%d]." % (prefix, i), ancestors) )
+        return values
+
+    for name, kind, info in spec.fields:
+        if _is_unset_recursion( model, name, kind, info, ancestors ): continue
+        value = getattr( model, name )
+        if kind in ('model', 'list') and value is None:
+            continue
+        elif kind == 'model':
+            values.update( form_values(value, prefix + name + ".", ancestors) )
+        elif kind == 'list':
+            values.update( form_values(value, prefix + name, ancestors) )
+        elif kind == 'base_list':
+            values[prefix + name] = u"\n".join( unicode(v) for v in value )
+        elif kind == 'base' and info[1] == 'checkbox':
+            if value:
+                values[prefix + name] = u"1"
+        elif kind == 'base' and info[1] in ('date', 'time'):
+            if value is not None:
+                values[prefix + name] = value.isoformat()
+        elif kind != 'any' and value is not None:
+            values[prefix + name] = unicode(value)
+    return values
+
+
+
+#==================================================================================================
+def form_data( model, _ancestors=() ):
+    """Returns the data of a model as described by its form schema (dicts, lists and base values),
+    ready to be serialized as json"""
+#--------------------------------------------------------------------------------------------------
+    spec = _get_spec( model.__class__ )
+    ancestors = _ancestors + (model.__class__,)
+    if spec.is_list:
+        return [ form_data(elem, ancestors) for elem in model._matrix ]
+
+    data = {}
+    for name, kind, info in spec.fields:
+        if kind == 'any' or _is_unset_recursion( model, name, kind, info, ancestors ): continue
+        value = getattr( model, name )
+        if kind in ('model', 'list'):
+            data[name] = None if value is None else form_data( value, ancestors )
+        elif kind == 'base_list':
+            data[name] = list( value )
+        else:
+            data[name] = value
+    return data
+
+
+
+################################################################################################
+##  FORM PARSING
+################################################################################################
+
+_path_token = re.compile( r'([^.\[\]]+)|\[(\d+)\]' )
+
+#==================================================================================================
+def parse_form( cls, form ):
+    """Parses submitted form fields (dict or list of pairs, as from parse_qsl) into a new instance
+    of the model class. Add/remove list actions in the submission are applied.
+    Returns the model and a dict of field paths to error messages."""
+#--------------------------------------------------------------------------------------------------
+    if isinstance( form, dict ):
+        form = form.items()
+    tree = {}
+    actions = []
+    for key, value in form:
+        if key in ('__add__', '__remove__'):
+            actions.append( (key, value) )
+        elif not key.startswith('__'):
+            _tree_set( tree, key, value )
+
+    for action, path in actions:
+        _tree_action( tree, action, path )
+
+    errors = {}
+    model = _build( cls, tree, "", errors )
+    return model, errors
+
+
+def _tree_set( tree, path, value ):
+    node = tree
+    tokens = _path_token.findall( path )
+    for i, (name, index) in enumerate( tokens ):
+        key = name or int(index)
+        if i == len(tokens) - 1:
+            if not isinstance( node.get(key), dict ):
+                node[key] = value
+        else:
+            node = _tree_node( node, key )
+
+
+def _tree_node( node, key ):
+    "The nested node at key. A plain value submitted for the same path is dropped, nested fields win"
+    child = node.get( key )
+    if not isinstance( child, dict ):
+        child = node[key] = {}
+    return child
+
+
+def _tree_action( tree, action, path ):
+    node = tree
+    tokens = [ name or int(index) for name, index in _path_token.findall( path ) ]
+    for key in tokens[:-1] if action == '__remove__' else tokens:
+        node = _tree_node( node, key )
+    if action == '__add__':
+        node[ max([-1] + [ k for k in node if isinstance(k, int) ]) + 1 ] = {}
+    elif tokens:
+        node.pop( tokens[-1], None )
+
+
+def _build( cls, tree, prefix, errors ):
+    spec = _get_spec( cls )
+    if spec.is_list:
+        if spec.inner is None:
+            #Elements of unknown type, ignored as 'any' fields are
+            return None
+        model = cls()
+        #Submitted elements, in index order (removed ones leave holes)
+        elems = []
+        for i in sorted( k for k in tree if isinstance(k, int) ):
+            if isinstance( tree[i], dict ):
+                elems.append( _build( spec.inner, tree[i], "%s[%d]." % (prefix, i), errors ) )
+            else:
+                errors["%s[%d]" % (prefix, i)] = "Invalid value %r: expected the fields of %s" % (tree[i], spec.inner.__name__)
+        model._matrix = elems
+        return model
+
+    model = cls()
+    values = {}
+    for name, kind, info in spec.fields:
+        raw = tree.get( name )
+        if raw is not None and kind != 'any' and isinstance( raw, dict ) != (kind in ('model', 'list')):
+            #A plain value for a nested model, or nested fields for a plain one
+            errors[prefix + name] = "Invalid value %r" % (raw,)
+            continue
+        try:
+            if kind == 'model':
+                if raw is not None:  #Not submitted is left to the default, it might be recursive
+                    values[name] = _build( info, raw, prefix + name + ".", errors )
+            elif kind == 'list':
+                if raw is not None:
+                    value = _build( info, raw, prefix + name, errors )
+                    if value is not None:
+                        values[name] = value
+            elif kind == 'base':
+                convert, input_t = info
+                if input_t == 'checkbox':
+                    values[name] = raw is not None and convert( raw )
+                elif raw not in (None, ""):
+                    values[name] = convert( raw )
+            elif kind == 'enum':
+                if raw is not None:
+                    values[name] = info[raw]
+            elif kind == 'base_list' and raw is not None:
+                values[name] = [ info(line) for line in raw.splitlines() if line.strip() ]
+        except (ValueError, KeyError, TypeError) as e:
+            errors[prefix + name] = "Invalid value %r: %s" % (raw, e)
+
+    try:
+        model.set( False, **values )
+    except Exception as e:
+        #Invalid value for a trait, set them one by one to find them
+        for name, value in values.items():
+            try:
+                model.set( False, **{name: value} )
+            except Exception as e:
+                errors[prefix + name] = str(e)
+    return model
+
+
+
+################################################################################################
+##  WSGI APPLICATION
+################################################################################################
+
+#==================================================================================================
+class FormsApp(object):
+    """A WSGI application serving the forms of a set of model classes:
+        GET  /               -> index of the models
+        GET  /Model          -> empty form
+        GET  /Model/schema   -> json form schema
+        POST /Model          -> parses the submission. Add/remove re-render the form,
+                                otherwise on_submit(model) is called and its result (or the
+                                model data) returned as json
+    """
+#--------------------------------------------------------------------------------------------------
+    def __init__(self, models, on_submit=None):
+        if not isinstance( models, dict ):
+            models = dict( (m.__name__, m) for m in models )
+        self.models = models
+        self.on_submit = on_submit
+
+    def __call__(self, environ, start_response):
+        parts = environ.get( 'PATH_INFO', '/' ).strip('/').split('/')
+        cls = self.models.get( parts[0] )
+
+        if not parts[0]:
+            links = u"".join( u'<li><a href="/%s">%s</a></li>' % (name, _escape(name)) for name in sorted(self.models) )
+            return self._reply( start_response, '200 OK', 'text/html', u"<ul>%s</ul>" % links )
+        if cls is None:
+            return self._reply( start_response, '404 Not Found', 'text/plain', u"Unknown model" )
+        if len(parts) > 1 and parts[1] == 'schema':
+            return self._reply( start_response, '200 OK', 'application/json', form_schema_json(cls) )
+        if environ['REQUEST_METHOD'] != 'POST':
+            return self._reply( start_response, '200 OK', 'text/html', render_form(cls) )
+
+        length = int( environ.get('CONTENT_LENGTH') or 0 )
+        #Split before decoding: on python 2 parse_qsl unquotes unicode text as latin-1
+        fields = [ (key.decode('utf-8'), value.decode('utf-8'))
+                   for key, value in parse_qsl( environ['wsgi.input'].read(length), keep_blank_values=True ) ]
+        model, errors = parse_form( cls, fields )
+        submitted = any( key == '__submit__' for key, _ in fields )
+        if errors or not submitted:
+            html = render_form( model )
+            if errors:
+                html = u"<ul class='errors'>%s</ul>\n%s" % (
+                    u"".join( u"<li>%s: %s</li>" % (_escape(k), _escape(unicode(v))) for k, v in sorted(errors.items()) ), html )
+            return self._reply( start_response, '200 OK', 'text/html', html )
+
+        result = self.on_submit( model ) if self.on_submit else form_data( model )
+        return self._reply( start_response, '200 OK', 'application/json', json.dumps(result, default=_json_default) )
+
+    @staticmethod
+    def _reply( start_response, status, content_type, body ):
+        body = body.encode('utf-8') if isinstance( body, unicode ) else body
+        start_response( status, [('Content-Type', content_type + '; charset=utf-8'),
+                                 ('Content-Length', str(len(body)))] )
+        return [body]
+
+
+def _json_default( obj ):
+    if isinstance( obj, HasTraits ):
+        return form_data( obj )
+    if hasattr( obj, '__dict__' ):
+        return vars( obj )
+    if hasattr( obj, 'isoformat' ):
+        return obj.isoformat()
+    return unicode( obj )
+
+
+#==================================================================================================
+def serve( models, host='localhost', port=8080, on_submit=None ):
+    """Serves the forms of the given models (list, or dict of name -> class) with the reference
+    WSGI server. Meant for local use and testing"""
+#--------------------------------------------------------------------------------------------------
+    httpd = make_server( host, port, FormsApp(models, on_submit) )
+    print( "Serving gForms on http://%s:%d/" % (host, port) )
+    httpd.serve_forever()
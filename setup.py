@@ -10,7 +10,7 @@ setup(name='gForms',
     author_email='fernando.pereira@cern.ch',
     url='',
     packages=['gforms_traits_patch'],
-    py_modules=['gforms'],
+    py_modules=['gforms', 'gforms_web'],
     install_requires = ['traitsui'],
     dependency_links=['https://github.com/ferdonline/traitsui/archive/gforms.zip']
   )
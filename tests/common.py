@@ -0,0 +1,14 @@
+"""Shared setup of the tests: no GUI toolkit, quiet logging, gforms importable from the checkout"""
+import os
+import sys
+
+os.environ.setdefault( 'ETS_TOOLKIT', 'null' )
+sys.path.insert( 0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir) )
+
+import gforms
+gforms._logging.loglevel = -1
+
+
+class Record(object):
+    def __init__( self, **kw ):
+        self.__dict__.update( kw )
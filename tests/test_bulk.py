@@ -0,0 +1,60 @@
+import unittest
+
+from common import gforms
+from gforms import ClassModel, Str, Int
+
+
+class Named(ClassModel):
+    name = Str
+    seen = []
+
+    def _name_changed( self, old, new ):
+        self.seen.append( (old, new) )
+
+
+class Templated(ClassModel):
+    name = Str
+    number = Int
+    _templates = { 'user1': {'name': "F1", 'number': 1} }
+
+
+class BulkUpdateTest( unittest.TestCase ):
+
+    def setUp( self ):
+        self.model = Named( name='keep' )
+        del Named.seen[:]
+
+    def test_commit_notifies_once( self ):
+        with self.model.bulk_update():
+            self.model.name = 'tmp'
+            self.model.name = 'new'
+        self.assertEqual( Named.seen, [('keep', 'new')] )
+
+    def test_rollback_does_not_notify( self ):
+        with self.assertRaises( ValueError ):
+            with self.model.bulk_update():
+                self.model.name = 'tmp'
+                raise ValueError()
+        self.assertEqual( self.model.name, 'keep' )
+        self.assertEqual( Named.seen, [] )
+
+    def test_template_commit( self ):
+        model = Templated()
+        with model.bulk_update():
+            model.Templates = 'user1'
+        self.assertEqual( (model.Templates, model.name, model.number), ('user1', "F1", 1) )
+
+    def test_template_rollback( self ):
+        model = Templated( name="F0" )
+        with self.assertRaises( ValueError ):
+            with model.bulk_update():
+                model.Templates = 'user1'
+                model.number = 5
+                raise ValueError()
+        self.assertEqual( (model.Templates, model.name, model.number), ("", "F0", 0) )
+        model.Templates = 'user1'
+        self.assertEqual( (model.name, model.number), ("F1", 1) )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+from common import gforms, Record
+
+
+class CompactItem(Record): pass
+class CompactOrder(Record): pass
+class CompactOdd(Record): pass
+
+
+def order():
+    return CompactOrder( name='o', tags=['x'], matrix=[[1, 2], [3]], owner=CompactItem(sku='z', qty=0),
+                         items=[ CompactItem(sku='a', qty=1), CompactItem(sku='b', qty=2) ] )
+
+
+class CompactRecordTest( unittest.TestCase ):
+
+    def setUp( self ):
+        self.source = order()
+        self.record = gforms.get_or_create_editor_for_obj( self.source ).get_object( compact=True )
+
+    def test_types( self ):
+        record = self.record
+        self.assertIsInstance( record, gforms.CompactObject )
+        self.assertEqual( type(record).__name__, 'CompactOrder' )
+        self.assertFalse( hasattr( record, '__weakref__' ) )
+        #One record type per model and fields, shared by the elements
+        self.assertIs( type(record.items[0]), type(record.items[1]) )
+        self.assertIs( type(record.items[0]), type(record.owner) )
+        self.assertEqual( record.items[0].__slots__, ('qty', 'sku') )
+        self.assertIsNot( record.items[0], self.source.items[0] )
+
+    def test_vars( self ):
+        item = self.record.items[1]
+        self.assertEqual( vars(item), {'sku': 'b', 'qty': 2} )
+        vars( item )['qty'] = 5  #A copy
+        self.assertEqual( item.qty, 2 )
+        self.assertEqual( sorted( vars(self.record) ), ['items', 'matrix', 'name', 'owner', 'tags'] )
+
+    def test_nested_lists( self ):
+        record = self.record
+        self.assertEqual( [ type(value) for value in (record.items, record.tags, record.matrix) ], [list] * 3 )
+        self.assertEqual( record.matrix, [[1, 2], [3]] )
+        self.assertEqual( [ (item.sku, item.qty) for item in record.items ], [('a', 1), ('b', 2)] )
+
+    def test_fields_not_identifiers( self ):
+        record = gforms.get_or_create_editor_for_obj( CompactOdd( **{'a-b': 1, 'c': 2} ) ).get_object( compact=True )
+        self.assertEqual( vars(record), {'a-b': 1, 'c': 2} )
+        self.assertNotIsInstance( record, gforms.CompactObject )
+
+
+if __name__ == '__main__':
+    unittest.main()
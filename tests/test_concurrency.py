@@ -0,0 +1,108 @@
+import random
+import threading
+import traceback
+import unittest
+
+from common import gforms, Record
+
+
+SCHEMA = {
+    'ConcDevice':     { 'properties': { 'name': 'string', 'port': 'integer', 'tags': ['string'] } },
+    'ConcDeviceList': { 'type': 'array', 'items': {'$ref': 'ConcDevice'} },
+}
+
+class ConcRecord(Record): pass
+class ConcAddress(Record): pass
+class ConcTag(Record): pass
+class ConcDevice(Record): pass
+class LockRecord(Record): pass
+
+
+def make_payload( rnd, i ):
+    records = []
+    for j in range( rnd.randint(2, 6) ):
+        record = ConcRecord( id=j, name="record %d.%d" % (i, j), score=rnd.random(),
+                             address=ConcAddress( street="Bytes Av", number=rnd.randint(1, 99) ),
+                             tags=[ ConcTag(label="t%d" % k) for k in range(rnd.randint(1, 3)) ],
+                             extra=ConcAddress(street="x", number=j) if j % 2 else j )
+        if rnd.random() < 0.3:
+            record.comment = "seen later"  #Extends the dynamic model
+        records.append( record )
+    devices = [ ConcDevice( name="dev%d" % k, port=k, tags=["a", "b"] ) for k in range(rnd.randint(1, 3)) ]
+    return { 'records': records, 'devices': devices, 'owner': "user %d" % i }
+
+
+def plain( obj ):
+    if isinstance( obj, dict ):
+        return dict( (k, plain(v)) for k, v in obj.items() if not k.startswith('_') )
+    if isinstance( obj, (list, tuple) ):
+        return [ plain(v) for v in obj ]
+    if hasattr( obj, '__dict__' ):
+        return plain( vars(obj) )
+    return obj
+
+
+def matches( expected, result ):
+    """Whether the result holds the expected data, models may add empty fields"""
+    if isinstance( expected, dict ) and isinstance( result, dict ):
+        return all( k in result and matches(v, result[k]) for k, v in expected.items() ) and \
+               all( not v for k, v in result.items() if k not in expected )
+    if isinstance( expected, list ) and isinstance( result, list ):
+        return len(expected) == len(result) and all( matches(a, b) for a, b in zip(expected, result) )
+    return expected == result
+
+
+class CountingLock( object ):
+    def __init__( self, lock ):
+        self.lock, self.count = lock, 0
+    def __enter__( self ):
+        self.count += 1
+        return self.lock.__enter__()
+    def __exit__( self, *exc ):
+        return self.lock.__exit__( *exc )
+
+
+class ConcurrentConversionTest( unittest.TestCase ):
+
+    def test_concurrent_conversions( self ):
+        #Reduced benchmarks/stress_concurrent_conversion.py
+        failures, schema_classes = [], []
+        start = threading.Event()
+
+        def worker( n ):
+            rnd = random.Random( n )
+            start.wait()
+            try:
+                schema_classes.append( gforms.load_schema( SCHEMA, cache_dir=False ) )
+                for i in range( 15 ):
+                    payload = make_payload( rnd, i )
+                    result = plain( gforms.get_or_create_editor_for_obj( payload ).get_object() )
+                    if not matches( plain(payload), result ):
+                        failures.append( "thread %d, payload %d: %r" % (n, i, result) )
+            except Exception:
+                failures.append( "thread %d:\n%s" % (n, traceback.format_exc()) )
+
+        threads = [ threading.Thread( target=worker, args=(n,) ) for n in range(4) ]
+        for thread in threads: thread.start()
+        start.set()
+        for thread in threads: thread.join()
+
+        self.assertEqual( failures, [] )
+        self.assertTrue( all( classes is schema_classes[0] for classes in schema_classes ) )
+        self.assertEqual( gforms._logging.depth, 0 )
+
+    def test_known_fields_dont_lock( self ):
+        gforms.get_or_create_editor_for_obj( [ LockRecord(a=1), LockRecord(a=2, b='x') ] )
+        lock = gforms._classes_lock = CountingLock( gforms._classes_lock )
+        try:
+            model = gforms.get_or_create_editor_for_obj( [ LockRecord(a=3, b='y') ] * 3 )
+            self.assertEqual( lock.count, 0 )
+            model = gforms.get_or_create_editor_for_obj( [ LockRecord(a=4, c=1.5) ] )
+            self.assertGreater( lock.count, 0 )  #Extending the model
+        finally:
+            gforms._classes_lock = lock.lock
+        self.assertEqual( model[0].c, 1.5 )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import csv
+import datetime
+import json
+import unittest
+from StringIO import StringIO
+
+from common import gforms, Record
+
+
+class ExportItem(Record): pass
+class ExportDims(Record): pass
+class ExportOrder(Record): pass
+
+
+def items():
+    return [ ExportItem( sku='a', qty=1, dims=ExportDims(w=1.5, h=2) ),
+             ExportItem( sku=u'b\xe9', qty=2, dims=ExportDims(w=2.0, h=1) ) ]
+
+
+class WriteJsonTest( unittest.TestCase ):
+
+    def test_same_as_dumps( self ):
+        model = gforms.get_or_create_editor_for_obj( {
+            'name': u'caf\xe9', 'n': 3, 'ratio': 0.5, 'tags': ['a', 'b'], 'owner': {'name': 'o', 'age': 4},
+            'items': [ {'sku': 'a', 'qty': 1, 'dims': {'w': 1.5}}, {'sku': 'b', 'qty': 2, 'dims': {'w': 2.0}} ] } )
+        out = StringIO()
+        gforms.write_json( model, out )
+        expected = json.dumps( model.get_object(as_dict=True), sort_keys=True, separators=(',', ':') )
+        self.assertEqual( out.getvalue(), expected )
+
+    def test_models_and_dates( self ):
+        model = gforms.get_or_create_editor_for_obj( ExportOrder( when=datetime.date(2020, 1, 2), items=items() ) )
+        out = StringIO()
+        gforms.write_json( model, out )
+        self.assertEqual( json.loads( out.getvalue() ),
+                          { 'when': '2020-01-02',
+                            'items': [ {'sku': 'a', 'qty': 1, 'dims': {'w': 1.5, 'h': 2}},
+                                       {'sku': u'b\xe9', 'qty': 2, 'dims': {'w': 2.0, 'h': 1}} ] } )
+
+
+class WriteCsvTest( unittest.TestCase ):
+
+    def test_columns_and_rows( self ):
+        out = StringIO()
+        self.assertEqual( gforms.write_csv( gforms.get_or_create_editor_for_obj( items() ), out ), 2 )
+        rows = list( csv.reader( StringIO( out.getvalue() ) ) )
+        self.assertEqual( rows, [ ['dims.h', 'dims.w', 'qty', 'sku'],
+                                  ['2', '1.5', '1', 'a'],
+                                  ['1', '2.0', '2', u'b\xe9'.encode('utf-8')] ] )
+
+    def test_given_columns( self ):
+        out = StringIO()
+        gforms.write_csv( gforms.get_or_create_editor_for_obj( items() ), out, columns=['sku', 'dims.w', 'missing'] )
+        self.assertEqual( out.getvalue().splitlines()[:2], ['sku,dims.w,missing', 'a,1.5,'] )
+
+    def test_only_lists( self ):
+        model = gforms.get_or_create_editor_for_obj( ExportOrder( when=None, items=items() ) )
+        self.assertRaises( gforms.FormsException, gforms.write_csv, model, StringIO() )
+
+
+if __name__ == '__main__':
+    unittest.main()
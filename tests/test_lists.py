@@ -0,0 +1,24 @@
+import unittest
+
+from common import gforms, Record
+
+
+class A(Record): pass
+class B(Record): pass
+
+
+class ListConversionTest( unittest.TestCase ):
+
+    def test_type_beyond_inference_sample( self ):
+        #With the default first_k inference, the last element is not in the sample
+        src = [ A(x=i) for i in range(60) ] + [ B(y='b') ]
+        model = gforms.get_or_create_editor_for_obj( src )
+        self.assertIsInstance( model, gforms.UnionListClassModel )
+        result = model.get_object()
+        self.assertIs( type(result[-1]), B )
+        self.assertEqual( vars(result[-1]), {'y': 'b'} )
+        self.assertEqual( [ type(elem) for elem in result[:60] ], [A] * 60 )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import gc
+import weakref
+import unittest
+
+from common import gforms, Record
+
+
+class PathUser(Record): pass
+class PathSystem(Record): pass
+
+
+class PathIndexTest( unittest.TestCase ):
+
+    def setUp( self ):
+        self.model = gforms.get_or_create_editor_for_obj(
+            PathSystem( admin=PathUser(name='x'), users=[ PathUser(name='a'), PathUser(name='b') ] ) )
+
+    def test_changes( self ):
+        self.assertEqual( self.model.get_path('users[1].name'), 'b' )
+        self.model.users._matrix[1] = gforms.get_or_create_editor_for_obj( PathUser(name='c') )
+        self.assertEqual( self.model.get_path('users[1].name'), 'c' )
+        self.assertEqual( self.model.set_path('users[*].name', 'd'), 2 )
+        self.assertEqual( [ v for _, v in self.model.select('users[*].name') ], ['d', 'd'] )
+
+    def test_set_init( self ):
+        #set_init assigns without notifying
+        self.assertEqual( self.model.get_path('admin.name'), 'x' )
+        self.model.set_init( {'admin': PathUser(name='NEW')} )
+        self.assertEqual( self.model.get_path('admin.name'), 'NEW' )
+
+    def test_rollback( self ):
+        self.assertEqual( self.model.get_path('admin.name'), 'x' )
+        try:
+            with self.model.bulk_update():
+                self.model.admin = gforms.get_or_create_editor_for_obj( PathUser(name='tmp') )
+                self.assertEqual( self.model.get_path('admin.name'), 'tmp' )
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual( self.model.get_path('admin.name'), 'x' )
+
+    def test_set_path_holds_only_the_written_models( self ):
+        updates, seen = [], []
+        user = self.model.users._matrix[0]
+        self.model.on_trait_change( lambda new: updates.append(new), 'bulk_updated' )
+        user.on_trait_change( lambda new: seen.append(new), 'name' )
+        with user.bulk_update():
+            #Another transaction, over models not written, is left alone
+            self.model.set_path( 'admin.name', 'y' )
+            user.name = 'held'
+            self.assertEqual( self.model.admin.name, 'y' )
+            self.assertEqual( seen, [] )
+        self.assertEqual( seen, ['held'] )
+        self.assertEqual( updates, [ [(self.model.admin, 'name')] ] )
+
+    def test_index_used_during_unrelated_bulk_update( self ):
+        other = gforms.get_or_create_editor_for_obj( PathUser(name='o') )
+        with other.bulk_update():
+            self.assertEqual( self.model.get_path('users[0].name'), 'a' )
+        self.assertIn( ('users', 0), self.model._path_index.nodes )
+
+    def test_deleted_root_is_collected( self ):
+        self.model.get_path( 'users[1].name' )
+        self.model.select( 'users[*].name' )
+        root = weakref.ref( self.model )
+        user = weakref.ref( self.model.users._matrix[0] )
+        del self.model
+        gc.collect()
+        self.assertIsNone( root() )
+        self.assertIsNone( user() )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+
+from common import gforms, Record
+
+
+class RefreshItem(Record): pass
+class RefreshOrder(Record): pass
+class RefreshNote(Record): pass
+
+
+def order( n, **kw ):
+    return RefreshOrder( name='o', items=[ RefreshItem(sku='s%d' % i, qty=i) for i in range(n) ], **kw )
+
+
+class RefreshTest( unittest.TestCase ):
+
+    def test_changed_element( self ):
+        model = gforms.get_or_create_editor_for_obj( order(5) )
+        kept = list( model.items._matrix )
+        new = order( 5 )
+        new.items[2].qty = 20
+        del new.items[4]
+        model.refresh_from( new )
+        self.assertEqual( [ item.qty for item in model.items._matrix ], [0, 1, 20, 3] )
+        self.assertEqual( [ a is b for a, b in zip(model.items._matrix, kept) ], [True] * 4 )
+
+    def test_new_field( self ):
+        model = gforms.get_or_create_editor_for_obj( order(2) )
+        model.refresh_from( order(2, note='new') )
+        self.assertEqual( model.note, 'new' )
+
+    def test_removed_field( self ):
+        model = gforms.get_or_create_editor_for_obj( RefreshNote(note='x', n=1) )
+        model.refresh_from( RefreshNote(n=2) )
+        self.assertEqual( (model.note, model.n), ('', 2) )
+        self.assertNotEqual( model.get_object().note, 'x' )
+
+    def test_removed_attribute( self ):
+        #Fields the model class was not created with are attributes without a declared trait
+        model = gforms.get_or_create_editor_for_obj( order(2, extra='x') )
+        new = order( 2 )
+        model.refresh_from( new )
+        self.assertIsNone( model.extra )
+        self.assertIsNone( model.get_object().extra )
+
+    def test_field_set_to_none( self ):
+        model = gforms.get_or_create_editor_for_obj( order(2, note='x') )
+        model.refresh_from( order(2, note=None) )
+        self.assertIn( model.note, ('', None) )
+        model.refresh_from( order(2, note='y') )
+        self.assertEqual( model.note, 'y' )
+
+    def test_edits_after_refresh( self ):
+        #Cached fingerprints are dropped by edits, notified or not
+        model = gforms.get_or_create_editor_for_obj( order(5) )
+        model.refresh_from( order(5) )
+        model.items[1].qty = 50
+        model.refresh_from( order(5) )
+        model.items[2].set_init( {'sku': 'x'} )
+        model.refresh_from( order(5) )
+        model.refresh_from( order(5) )
+        with model.items[3].bulk_update():
+            model.items[3].qty = 30
+            model.refresh_from( order(5) )
+        self.assertEqual( [ (item.sku, item.qty) for item in model.items._matrix ],
+                          [ ('s%d' % i, i) for i in range(5) ] )
+
+    def test_unchanged_models_skipped( self ):
+        model = gforms.get_or_create_editor_for_obj( order(200) )
+        model.refresh_from( order(200) )
+        digested = []
+        model_fingerprint = gforms._model_fingerprint
+        def counting( m ):
+            if '_fingerprint_cache' not in m.__dict__:
+                digested.append( m )
+            return model_fingerprint( m )
+        gforms._model_fingerprint = counting
+        try:
+            new = order( 200 )
+            new.items[100].qty = -1
+            model.refresh_from( new )
+        finally:
+            gforms._model_fingerprint = model_fingerprint
+        self.assertEqual( model.items[100].qty, -1 )
+        self.assertLessEqual( len(digested), 5 )
+
+
+if __name__ == '__main__':
+    unittest.main()
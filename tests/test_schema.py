@@ -0,0 +1,55 @@
+import unittest
+
+from common import gforms, Record
+
+
+SCHEMA = {
+    'SchemaUser':     { 'properties': { 'name': 'string', 'number': 'integer' } },
+    'SchemaUserList': { 'type': 'array', 'items': {'$ref': 'SchemaUser'} },
+    'SchemaSystem':   { 'properties': { 'users': {'$ref': 'SchemaUserList'}, 'location': 'string' } }
+}
+
+class SchemaUser(Record): pass
+class SchemaSystem(Record): pass
+
+
+class SchemaTest( unittest.TestCase ):
+
+    @classmethod
+    def setUpClass( cls ):
+        cls.models = gforms.load_schema( SCHEMA, cache_dir=False )
+
+    def test_list_elements_convert_back_to_source_type( self ):
+        src = SchemaSystem( location="here", users=[ SchemaUser(name="F1", number=1) ] )
+        model = gforms.get_or_create_editor_for_obj( src )
+        self.assertIsInstance( model, self.models['SchemaSystem'] )
+        model.users._matrix[0].number = 5
+        result = model.get_object()
+        self.assertIs( result, src )
+        self.assertEqual( [ type(user) for user in result.users ], [SchemaUser] )
+        self.assertEqual( result.users[0].number, 5 )
+
+    def test_empty_model( self ):
+        model = self.models['SchemaSystem']()
+        self.assertEqual( len( model.users._matrix ), 0 )
+
+    def test_inline_item_models( self ):
+        models = gforms.load_schema( {
+            'InlineUser': { 'properties': {
+                'roles':  [ {'properties': {'r': 'string'}} ],
+                'groups': { 'type': 'array', 'items': {'properties': {'g': 'integer'}} } } }
+        }, cache_dir=False, register=False )
+        self.assertTrue( issubclass( models['InlineUser_roles'], gforms.ListClassModel ) )
+        self.assertIn( 'r', models['InlineUser_roles_item'].class_traits() )
+        user = models['InlineUser']()
+        user.groups.append( models['InlineUser_groups_item']( g=1 ) )
+        self.assertEqual( [ group.g for group in user.groups ], [1] )
+
+    def test_duplicate_names( self ):
+        with self.assertRaises( gforms.FormsException ):
+            gforms.compile_schema( { 'Dup':       { 'properties': { 'x': {'properties': {'a': 'string'}} } },
+                                     'Dup_x':     { 'properties': { 'b': 'string'} } } )
+
+
+if __name__ == '__main__':
+    unittest.main()
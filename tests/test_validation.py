@@ -0,0 +1,51 @@
+import unittest
+
+from common import gforms
+from gforms import ClassModel, List, Int, Float, TraitError
+
+
+class Numbers(ClassModel):
+    ys = List( Int )
+
+class Samples(ClassModel):
+    xs = List( Float )
+
+
+class BatchValidationTest( unittest.TestCase ):
+
+    def test_big_ints_are_not_wrapped( self ):
+        for size in (10, 1000):  #Per value, and with numpy when installed
+            model = Numbers()
+            model.set_init( {'ys': [2**63 + 5] * size} )
+            self.assertEqual( set(model.ys), set([2**63 + 5]) )
+
+    def test_lists_not_revalidated( self ):
+        #Elements validated in batch dont go through the trait again, only the rejected ones
+        handler = Samples.class_traits()['xs'].handler.item_trait.handler
+        calls = []
+        def validate( obj, name, value ):
+            calls.append( value )
+            return Float.validate( handler, obj, name, value )
+        handler.validate = validate
+        try:
+            model = Samples()
+            model.set_init( {'xs': [1, 2.5, 'x'] * 100} )
+        finally:
+            del handler.validate
+        self.assertEqual( calls, [] )
+        self.assertEqual( model.xs, [1.0, 2.5] * 100 )
+        self.assertIs( type(model.xs[0]), float )
+        changes = []
+        model.on_trait_change( lambda: changes.append( 1 ), 'xs_items' )
+        model.xs.append( 3 )
+        self.assertEqual( (model.xs[-1], changes), (3.0, [1]) )
+        self.assertRaises( TraitError, model.xs.append, 'y' )
+
+    def test_ints( self ):
+        values, bad = gforms.validate_batch( Int, range(2000) + [True] )
+        self.assertEqual( values, range(2000) + [1] )
+        self.assertEqual( bad, [] )
+
+
+if __name__ == '__main__':
+    unittest.main()
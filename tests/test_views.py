@@ -0,0 +1,48 @@
+import unittest
+
+from common import gforms, Record
+from gforms import ClassModel, GenericTrait, Str, Int
+
+
+class ViewItem(Record): pass
+
+class Named(ClassModel):
+    name = Str
+
+class AlsoNamed(ClassModel):
+    name = Str
+
+
+def view_names( view ):
+    return [ item.name for item in view.content.content[0].content ]
+
+
+class ViewCacheTest( unittest.TestCase ):
+
+    def test_shared_for_equal_signatures( self ):
+        a = gforms.get_or_create_editor_for_obj( ViewItem(sku='a', qty=1) )
+        b = gforms.get_or_create_editor_for_obj( ViewItem(sku='b', qty=2) )
+        self.assertIs( a.default_traits_view(), b.default_traits_view() )
+        self.assertIs( Named().default_traits_view(), AlsoNamed().default_traits_view() )
+        self.assertIs( GenericTrait( {'x': 1, 'y': 's'} ).default_traits_view(),
+                       GenericTrait( {'x': 5, 'y': 't'} ).default_traits_view() )
+
+    def test_added_trait( self ):
+        generic = GenericTrait( {'x': 1, 'y': 's'} )
+        view = generic.default_traits_view()
+        generic.add_trait( 'z', Int )
+        self.assertIsNot( generic.default_traits_view(), view )
+        self.assertEqual( view_names( generic.default_traits_view() ), ['x', 'y', 'z'] )
+        self.assertEqual( view_names( view ), ['x', 'y'] )
+
+    def test_retyped_trait( self ):
+        self.assertIsNot( GenericTrait( {'x': 1, 'y': 's'} ).default_traits_view(),
+                          GenericTrait( {'x': 's', 'y': 's'} ).default_traits_view() )
+
+    def test_declared_views_not_cached( self ):
+        model = gforms.get_or_create_editor_for_obj( [ ViewItem(sku='a', qty=1) ] )
+        self.assertEqual( view_names( model.trait_view() ), ['_matrix'] )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+
+from common import gforms, Record
+
+
+class WarmRecord(Record): pass
+
+
+class WarmUpTest( unittest.TestCase ):
+
+    def test_samples_of_the_same_type( self ):
+        first, second = WarmRecord( name='a' ), WarmRecord( name='b', number=1 )
+        samples = [ WarmRecord( tags=['x'] ) ]
+        timings = gforms.warm_up( [ first, second, samples ], workers=2 ).wait()
+        for key in ( first, second, id(samples) ):
+            self.assertIn( key, timings )
+
+    def test_wait_returns_a_copy( self ):
+        handle = gforms.warm_up( [ WarmRecord(name='a') ] )
+        timings = handle.wait()
+        timings.clear()
+        self.assertTrue( handle.timings )
+
+
+if __name__ == '__main__':
+    unittest.main()
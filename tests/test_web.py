@@ -0,0 +1,73 @@
+import json
+import unittest
+from StringIO import StringIO
+from wsgiref.util import setup_testing_defaults
+
+from common import gforms, Record
+import gforms_web
+
+
+SCHEMA = {
+    'WebUser':     { 'properties': { 'name': 'string', 'number': 'integer' } },
+    'WebUserList': { 'type': 'array', 'items': {'$ref': 'WebUser'} },
+    'WebSystem':   { 'properties': { 'users': {'$ref': 'WebUserList'}, 'admin': 'WebUser' } }
+}
+
+class Item(Record): pass
+class Order(Record): pass
+
+
+def wsgi_call( app, method, path, body="" ):
+    environ = {}
+    setup_testing_defaults( environ )
+    environ.update( REQUEST_METHOD=method, PATH_INFO=path, CONTENT_LENGTH=str(len(body)) )
+    environ['wsgi.input'] = StringIO( body )
+    status = []
+    body = app( environ, lambda s, headers: status.append(s) )
+    return status[0], b"".join( body ).decode('utf-8')
+
+
+class DynamicModelFormTest( unittest.TestCase ):
+
+    def setUp( self ):
+        self.model = gforms.get_or_create_editor_for_obj(
+            Order( name='o', items=[ Item(sku='a', qty=1) ], empty=[] ) )
+
+    def test_render( self ):
+        html = gforms_web.render_form( self.model )
+        self.assertIn( u'name="items[0].sku" value="a"', html )
+
+    def test_schema( self ):
+        schema = gforms_web.form_schema( type(self.model) )
+        self.assertEqual( schema['definitions']['Order']['properties']['name'], {'type': 'string'} )
+
+    def test_data( self ):
+        data = gforms_web.form_data( self.model )
+        self.assertEqual( data['items'], [ {'sku': 'a', 'qty': 1} ] )
+        self.assertEqual( gforms_web.form_values( self.model )['items[0].qty'], u'1' )
+
+
+class FormsAppTest( unittest.TestCase ):
+
+    def setUp( self ):
+        self.app = gforms_web.FormsApp( gforms.load_schema( SCHEMA, cache_dir=False ) )
+
+    def test_utf8_submission( self ):
+        status, body = wsgi_call( self.app, 'POST', '/WebSystem', "admin.name=%C3%A9&__submit__=1" )
+        self.assertEqual( status, '200 OK' )
+        self.assertEqual( json.loads( body )['admin']['name'], u'\xe9' )
+
+    def test_plain_value_for_model( self ):
+        status, body = wsgi_call( self.app, 'POST', '/WebSystem', "admin=abc&__submit__=1" )
+        self.assertEqual( status, '200 OK' )
+        self.assertIn( u"class='errors'", body )
+        self.assertIn( u"<li>admin: ", body )
+
+    def test_plain_value_for_list_element( self ):
+        model, errors = gforms_web.parse_form( self.app.models['WebSystem'], {'users[0]': 'x', 'users[1].name': 'b'} )
+        self.assertEqual( list(errors), ['users[0]'] )
+        self.assertEqual( [ user.name for user in model.users ], ['b'] )
+
+
+if __name__ == '__main__':
+    unittest.main()
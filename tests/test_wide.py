@@ -0,0 +1,67 @@
+import unittest
+
+from common import gforms, Record
+
+
+class WideRecord(Record): pass
+
+
+def page_names( wide ):
+    return sorted( wide.page_fields.trait_names( private=gforms.is_none, type=gforms.not_event ) )
+
+
+class WideObjectTest( unittest.TestCase ):
+
+    def setUp( self ):
+        self.source = dict( ('k%03d' % i, i) for i in range(600) )
+        self.source.update( nested={'x': 1}, other5=5 )
+        self.wide = gforms.get_or_create_editor_for_obj( self.source )
+
+    def test_paging( self ):
+        wide = self.wide
+        self.assertIsInstance( wide, gforms.WideGenericTrait )
+        self.assertEqual( (wide.Pages, wide.Page), (13, 1) )
+        self.assertEqual( page_names(wide), [ 'k%03d' % i for i in range(50) ] )
+        wide.Page = 13
+        self.assertEqual( page_names(wide), ['nested', 'other5'] )
+        wide.Page = 99
+        self.assertEqual( wide.Page, 13 )
+
+    def test_filters( self ):
+        wide = self.wide
+        wide.Filter_mode = 'prefix'
+        wide.Filter = 'k05'
+        self.assertEqual( page_names(wide), [ 'k%03d' % i for i in range(50, 60) ] )
+        self.assertEqual( (wide.Pages, wide.Page), (1, 1) )
+        wide.Filter_mode = 'substring'
+        self.assertEqual( wide._matches, [ 'k%03d' % i for i in range(50, 60) ] )
+        wide.Filter = '5'
+        expected = sorted( name for name in self.source if '5' in name )
+        self.assertEqual( wide._matches, expected )
+        wide.Filter = '55'  #Narrower, looks into the previous matches
+        self.assertEqual( wide._matches, sorted( name for name in self.source if '55' in name ) )
+        wide.Filter = ''
+        self.assertEqual( wide.Pages, 13 )
+
+    def test_edits_persisted( self ):
+        wide = self.wide
+        wide.page_fields.k002 = -2
+        wide.Filter = 'nested'
+        wide.page_fields.nested.x = 7
+        wide.Filter = 'k59'
+        wide.page_fields.k599 = -599
+        result = wide.get_object()
+        self.assertEqual( (result['k002'], result['nested'], result['k599']), (-2, {'x': 7}, -599) )
+        self.assertEqual( len( result ), 602 )
+
+    def test_object_source( self ):
+        source = WideRecord( **dict( ('f%03d' % i, 'v') for i in range(501) ) )
+        wide = gforms.get_or_create_editor_for_obj( source )
+        self.assertIsInstance( wide, gforms.WideGenericTrait )
+        wide.page_fields.f000 = 'edited'
+        self.assertIs( wide.get_object(), source )
+        self.assertEqual( source.f000, 'edited' )
+
+
+if __name__ == '__main__':
+    unittest.main()